@@ -0,0 +1,85 @@
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+class AlertHistoryStore:
+    """SQLite store for alerts that have aged out of the in-memory history.
+
+    Records are the JSON form of an alert; the columns used for filtering are
+    kept alongside the payload so queries never decode rows they discard.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        # Writes run on a worker thread while reads come from the event loop
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            # With WAL, NORMAL only syncs at checkpoints; each batch is one commit
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS alerts (
+                    id TEXT PRIMARY KEY,
+                    speaker_id TEXT NOT NULL,
+                    severity TEXT NOT NULL,
+                    created_at_ts REAL NOT NULL,
+                    payload BLOB NOT NULL
+                )
+                """
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS alerts_created_at_ts ON alerts (created_at_ts)")
+        return self._connection
+
+    def append(self, records: List[Dict[str, Any]]):
+        """Persist alert records in a single transaction"""
+        rows = [
+            (record["id"], record["speaker_id"], record["severity"], record["created_at_ts"], orjson.dumps(record))
+            for record in records
+        ]
+
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany("INSERT OR REPLACE INTO alerts VALUES (?, ?, ?, ?, ?)", rows)
+
+    def get(self, alert_id: str) -> Optional[Dict[str, Any]]:
+        """Return the stored record for an alert id, if any"""
+        with self._lock:
+            row = self._connect().execute("SELECT payload FROM alerts WHERE id = ?", (alert_id,)).fetchone()
+
+        return orjson.loads(row[0]) if row else None
+
+    def query(self,
+              since_ts: Optional[float] = None,
+              speaker_id: Optional[str] = None,
+              severity: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return stored alert records matching the filters, oldest first"""
+        clauses = []
+        params: List[Any] = []
+
+        if since_ts is not None:
+            clauses.append("created_at_ts > ?")
+            params.append(since_ts)
+        if speaker_id is not None:
+            clauses.append("speaker_id = ?")
+            params.append(speaker_id)
+        if severity is not None:
+            clauses.append("severity = ?")
+            params.append(severity)
+
+        sql = "SELECT payload FROM alerts"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at_ts"
+
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+
+        return [orjson.loads(payload) for (payload,) in rows]
@@ -1,11 +1,24 @@
 from crewai import Agent, Task, Crew
 from langchain_openai import ChatOpenAI
-from typing import List, Dict, Any, Optional, Callable
-import json
+from typing import List, Dict, Any, Optional, Callable, Deque, FrozenSet
+import orjson
 from pydantic import BaseModel
+from dataclasses import dataclass, field
 from datetime import datetime
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
+import os
+import time
+import bisect
+import functools
+import itertools
+import logging
 from enum import Enum
+from aiolimiter import AsyncLimiter
+
+from .alert_history_store import AlertHistoryStore
+from .keyword_matcher import KeywordMatcher
 
 class AlertSeverity(str, Enum):
     """Alert severity levels"""
@@ -22,8 +35,73 @@ class AlertType(str, Enum):
     ETHICAL_CONCERN = "ethical_concern"
     OPERATIONAL_ISSUE = "operational_issue"
 
-class ComplianceAlert(BaseModel):
-    """Model for compliance alerts"""
+logger = logging.getLogger(__name__)
+
+# Display strings for alert messages, computed once
+_ALERT_TYPE_NAMES = {alert_type.value: alert_type.value.replace('_', ' ').title() for alert_type in AlertType}
+
+_SEVERITY_MESSAGES = {
+    AlertSeverity.CRITICAL.value: ("🚨 CRITICAL", "detected. Immediate attention required."),
+    AlertSeverity.HIGH.value: ("⚠️ HIGH", "identified. Review needed."),
+    AlertSeverity.MEDIUM.value: ("📋 MEDIUM", "noted. Monitor closely."),
+    AlertSeverity.LOW.value: ("ℹ️ LOW", "observed. For awareness.")
+}
+
+# Keyword catalogs used by the assessment tool
+_CRITICAL_KEYWORDS = ("fraud", "criminal", "illegal", "bribery")
+_HIGH_KEYWORDS = ("violation", "breach", "prohibited", "penalty")
+_MEDIUM_KEYWORDS = ("risk", "concern", "issue", "non-compliance")
+
+# Checked in order; the first matching bucket determines the alert type
+_TYPE_KEYWORDS = (
+    (AlertType.ETHICAL_CONCERN, ("ethical", "integrity", "conflict")),
+    (AlertType.REGULATORY_RISK, ("financial", "accounting", "audit")),
+    (AlertType.POLICY_BREACH, ("policy", "procedure", "guideline")),
+    (AlertType.OPERATIONAL_ISSUE, ("operational", "safety", "security")),
+)
+
+_RISK_KEYWORDS = ("penalty", "fine", "legal action", "reputation", "regulatory")
+
+# One automaton over every catalog, so a transcript is scanned once
+_KEYWORD_MATCHER = KeywordMatcher({
+    AlertSeverity.CRITICAL.value: _CRITICAL_KEYWORDS,
+    AlertSeverity.HIGH.value: _HIGH_KEYWORDS,
+    AlertSeverity.MEDIUM.value: _MEDIUM_KEYWORDS,
+    **{alert_type.value: keywords for alert_type, keywords in _TYPE_KEYWORDS},
+    "risk_factors": _RISK_KEYWORDS
+})
+
+# Action plans keyed by severity and alert type
+_ESCALATION_ACTIONS = [
+    "Immediate review of the violation",
+    "Consult with legal/compliance team",
+    "Document the incident",
+    "Assess potential regulatory impact"
+]
+
+_SEVERITY_ACTIONS = {
+    AlertSeverity.CRITICAL.value: _ESCALATION_ACTIONS + [
+        "Notify senior management immediately",
+        "Consider external legal counsel",
+        "Prepare regulatory notification if required"
+    ],
+    AlertSeverity.HIGH.value: _ESCALATION_ACTIONS,
+    AlertSeverity.MEDIUM.value: [
+        "Review the compliance concern",
+        "Monitor for similar issues",
+        "Update relevant policies if needed"
+    ],
+    AlertSeverity.LOW.value: ["Monitor for escalation", "Document for future reference"]
+}
+
+_TYPE_ACTIONS = {
+    AlertType.ETHICAL_CONCERN.value: "Review ethical guidelines and training",
+    AlertType.REGULATORY_RISK.value: "Review financial controls and procedures",
+    AlertType.OPERATIONAL_ISSUE.value: "Review operational procedures and safety protocols"
+}
+
+class ComplianceAlertModel(BaseModel):
+    """API model for compliance alerts"""
     id: str
     speaker_id: str
     timestamp: str
@@ -37,17 +115,57 @@ class ComplianceAlert(BaseModel):
     action_required: bool = False
     action_items: List[str] = []
     created_at: str
+    created_at_ts: float
     acknowledged: bool = False
     acknowledged_by: Optional[str] = None
     acknowledged_at: Optional[str] = None
 
+@dataclass(slots=True, kw_only=True)
+class ComplianceAlert:
+    """Compliance alert as stored by the alert manager.
+    
+    A plain slotted dataclass, since alerts are built from internal data and
+    need no validation; use to_pydantic() at the API boundary.
+    """
+    id: str
+    speaker_id: str
+    timestamp: str
+    transcript_segment: str
+    alert_type: AlertType
+    severity: AlertSeverity
+    message: str
+    matched_document: Optional[str] = None
+    confidence_score: float
+    context: Optional[str] = None
+    action_required: bool = False
+    action_items: List[str] = field(default_factory=list)
+    created_at: str
+    created_at_ts: float
+    acknowledged: bool = False
+    acknowledged_by: Optional[str] = None
+    acknowledged_at: Optional[str] = None
+    
+    # Lowercased word set of the transcript, cached for duplicate detection
+    _token_set: FrozenSet[str] = field(default=frozenset(), repr=False, compare=False)
+    
+    def to_pydantic(self) -> ComplianceAlertModel:
+        """Convert to the API model without re-running validation"""
+        return ComplianceAlertModel.model_construct(
+            **{name: getattr(self, name) for name in ComplianceAlertModel.model_fields}
+        )
+
 class AlertManagerAgent:
     """Alert management agent using CrewAI"""
     
-    def __init__(self, openai_api_key: str, alert_callback: Optional[Callable] = None):
+    def __init__(self, openai_api_key: str, alert_callback: Optional[Callable] = None,
+                 use_llm_refinement: bool = False):
         self.openai_api_key = openai_api_key
         self.alert_callback = alert_callback
         
+        # The tools are deterministic, so the Crew is only needed when the
+        # alert text should be polished by the LLM
+        self.use_llm_refinement = use_llm_refinement
+        
         # Initialize LLM
         self.llm = ChatOpenAI(
             openai_api_key=openai_api_key,
@@ -55,13 +173,53 @@ class AlertManagerAgent:
             temperature=0.1
         )
         
+        # CrewAI's step-by-step console output is for debugging only
+        self.verbose = os.getenv("CREWAI_VERBOSE", "false").lower() == "true"
+        
         # Create CrewAI agents
         self._create_agents()
         
-        # Alert storage (in production, this would be a database)
-        self.alerts: List[ComplianceAlert] = []
+        # Recent alerts are kept in memory; older ones are evicted to an
+        # on-disk history store so memory and scan cost stay bounded
+        self.hot_capacity = int(os.getenv("ALERT_HOT_CAPACITY", "1000"))
+        self.alerts: Deque[ComplianceAlert] = deque(maxlen=self.hot_capacity)
         self.alert_counter = 0
         
+        # Creation epochs parallel to self.alerts; append-only, so sorted
+        self._created_ts: Deque[float] = deque(maxlen=self.hot_capacity)
+        
+        # Evicted alerts wait in _cold_pending until the flush task writes them
+        self._history_store = AlertHistoryStore(os.getenv("ALERT_HISTORY_PATH", "alert_history.db"))
+        self._cold_pending: List[ComplianceAlert] = []
+        self._cold_pending_event = asyncio.Event()
+        self._cold_flushed_event = asyncio.Event()
+        self._cold_flushed_event.set()
+        self._flush_task: Optional[asyncio.Task] = None
+        
+        # A single writer thread commits evicted alerts in batches
+        self.history_batch_size = 256
+        # Failed writes are retried with exponential backoff before giving up
+        self.history_max_retries = 5
+        self.history_retry_delay = 0.5
+        self._history_error: Optional[Exception] = None
+        self._history_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alert-history")
+        self._evicted_count = 0
+        
+        # Alert lookup by id for acknowledgements
+        self._alerts_by_id: Dict[str, ComplianceAlert] = {}
+        
+        # Per-speaker indexes so suppression and filtering avoid full scans.
+        # _recent_by_speaker only holds alerts inside the duplicate window.
+        self._recent_by_speaker: Dict[str, Deque[ComplianceAlert]] = defaultdict(deque)
+        self._alerts_by_speaker: Dict[str, Deque[ComplianceAlert]] = defaultdict(deque)
+        self._speaker_count: Counter = Counter()
+        
+        # Running totals for get_alert_statistics
+        self._severity_counts: Counter = Counter()
+        self._type_counts: Counter = Counter()
+        self._ack_count = 0
+        self._error_count = 0
+        
         # Alert thresholds and filters
         self.severity_thresholds = {
             AlertSeverity.LOW: 0.6,
@@ -74,6 +232,12 @@ class AlertManagerAgent:
         self.suppress_duplicates = True
         self.duplicate_time_window = 300  # 5 minutes
         self.max_alerts_per_speaker = 10  # per session
+        
+        # LLM throttling: bounded in-flight requests plus a per-minute ceiling
+        self.max_concurrent_llm = int(os.getenv("ALERT_LLM_CONCURRENCY", "8"))
+        self.llm_requests_per_minute = int(os.getenv("ALERT_LLM_RPM", "60"))
+        self._llm_semaphore = asyncio.Semaphore(self.max_concurrent_llm)
+        self._llm_rate_limiter = AsyncLimiter(self.llm_requests_per_minute, 60)
     
     def _create_agents(self):
         """Create the CrewAI agents for alert management"""
@@ -85,7 +249,7 @@ class AlertManagerAgent:
             backstory="""You are an expert in compliance risk assessment and alert management. 
             You can quickly evaluate the severity of compliance issues and determine the appropriate 
             level of alert needed for board members and compliance officers.""",
-            verbose=True,
+            verbose=self.verbose,
             allow_delegation=False,
             llm=self.llm,
             tools=[self._assess_violation_tool]
@@ -98,7 +262,7 @@ class AlertManagerAgent:
             backstory="""You are an expert in risk communication and alert formulation. 
             You create clear, concise, and actionable alerts that help decision-makers understand 
             compliance risks without causing unnecessary alarm or confusion.""",
-            verbose=True,
+            verbose=self.verbose,
             allow_delegation=False,
             llm=self.llm,
             tools=[self._formulate_alert_tool]
@@ -111,7 +275,7 @@ class AlertManagerAgent:
             backstory="""You are an expert in compliance remediation and action planning. 
             You can identify the specific actions needed to address compliance violations 
             and provide clear guidance on next steps.""",
-            verbose=True,
+            verbose=self.verbose,
             allow_delegation=False,
             llm=self.llm,
             tools=[self._plan_actions_tool]
@@ -120,152 +284,176 @@ class AlertManagerAgent:
     def _assess_violation_tool(self, violation_data: str) -> str:
         """Tool for assessing violation severity and type"""
         try:
-            data = json.loads(violation_data)
-            
-            assessment = {
-                "severity": AlertSeverity.LOW.value,
-                "alert_type": AlertType.COMPLIANCE_VIOLATION.value,
-                "confidence": data.get("confidence_score", 0.0),
-                "risk_factors": [],
-                "business_impact": "minimal"
-            }
-            
-            # Assess severity based on confidence and content
-            confidence = data.get("confidence_score", 0.0)
-            transcript = data.get("transcript_segment", "").lower()
-            
-            # Determine severity based on confidence and keywords
-            if confidence >= 0.9 or any(word in transcript for word in ["fraud", "criminal", "illegal", "bribery"]):
-                assessment["severity"] = AlertSeverity.CRITICAL.value
-                assessment["business_impact"] = "severe"
-            elif confidence >= 0.8 or any(word in transcript for word in ["violation", "breach", "prohibited", "penalty"]):
-                assessment["severity"] = AlertSeverity.HIGH.value
-                assessment["business_impact"] = "significant"
-            elif confidence >= 0.7 or any(word in transcript for word in ["risk", "concern", "issue", "non-compliance"]):
-                assessment["severity"] = AlertSeverity.MEDIUM.value
-                assessment["business_impact"] = "moderate"
-            
-            # Determine alert type based on content
-            if any(word in transcript for word in ["ethical", "integrity", "conflict"]):
-                assessment["alert_type"] = AlertType.ETHICAL_CONCERN.value
-            elif any(word in transcript for word in ["financial", "accounting", "audit"]):
-                assessment["alert_type"] = AlertType.REGULATORY_RISK.value
-            elif any(word in transcript for word in ["policy", "procedure", "guideline"]):
-                assessment["alert_type"] = AlertType.POLICY_BREACH.value
-            elif any(word in transcript for word in ["operational", "safety", "security"]):
-                assessment["alert_type"] = AlertType.OPERATIONAL_ISSUE.value
-            
-            # Identify risk factors
-            risk_keywords = ["penalty", "fine", "legal action", "reputation", "regulatory"]
-            assessment["risk_factors"] = [word for word in risk_keywords if word in transcript]
-            
-            return json.dumps(assessment)
-            
+            return orjson.dumps(self._assess_violation(orjson.loads(violation_data))).decode()
         except Exception as e:
-            return json.dumps({"error": str(e)})
+            return orjson.dumps({"error": str(e)}).decode()
     
     def _formulate_alert_tool(self, assessment_data: str) -> str:
         """Tool for formulating alert messages"""
         try:
-            assessment = json.loads(assessment_data)
-            
-            # Create alert message based on severity and type
-            severity = assessment.get("severity", AlertSeverity.LOW.value)
-            alert_type = assessment.get("alert_type", AlertType.COMPLIANCE_VIOLATION.value)
-            business_impact = assessment.get("business_impact", "minimal")
-            
-            # Generate appropriate message based on severity
-            if severity == AlertSeverity.CRITICAL.value:
-                message = f"🚨 CRITICAL: {alert_type.replace('_', ' ').title()} detected. Immediate attention required."
-            elif severity == AlertSeverity.HIGH.value:
-                message = f"⚠️ HIGH: {alert_type.replace('_', ' ').title()} identified. Review needed."
-            elif severity == AlertSeverity.MEDIUM.value:
-                message = f"📋 MEDIUM: {alert_type.replace('_', ' ').title()} noted. Monitor closely."
-            else:
-                message = f"ℹ️ LOW: {alert_type.replace('_', ' ').title()} observed. For awareness."
-            
-            # Add business impact information
-            message += f" Business impact: {business_impact}."
-            
-            formulation = {
-                "message": message,
-                "tone": "professional",
-                "urgency": severity,
-                "clarity_score": 0.9
-            }
-            
-            return json.dumps(formulation)
-            
+            return orjson.dumps(self._formulate_alert(orjson.loads(assessment_data))).decode()
         except Exception as e:
-            return json.dumps({"error": str(e)})
+            return orjson.dumps({"error": str(e)}).decode()
     
     def _plan_actions_tool(self, alert_data: str) -> str:
         """Tool for planning required actions"""
         try:
-            data = json.loads(alert_data)
-            
-            severity = data.get("severity", AlertSeverity.LOW.value)
-            alert_type = data.get("alert_type", AlertType.COMPLIANCE_VIOLATION.value)
-            
-            actions = []
-            action_required = False
-            
-            # Determine actions based on severity and type
-            if severity in [AlertSeverity.CRITICAL.value, AlertSeverity.HIGH.value]:
-                action_required = True
-                actions.extend([
-                    "Immediate review of the violation",
-                    "Consult with legal/compliance team",
-                    "Document the incident",
-                    "Assess potential regulatory impact"
-                ])
-                
-                if severity == AlertSeverity.CRITICAL.value:
-                    actions.extend([
-                        "Notify senior management immediately",
-                        "Consider external legal counsel",
-                        "Prepare regulatory notification if required"
-                    ])
+            return orjson.dumps(self._plan_actions(orjson.loads(alert_data))).decode()
+        except Exception as e:
+            return orjson.dumps({"error": str(e)}).decode()
+    
+    def _assess_violation(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Assess violation severity, type and risk factors"""
+        assessment = {
+            "severity": AlertSeverity.LOW.value,
+            "alert_type": AlertType.COMPLIANCE_VIOLATION.value,
+            "confidence": data.get("confidence_score", 0.0),
+            "risk_factors": [],
+            "business_impact": "minimal"
+        }
+        
+        # Assess severity based on confidence and content
+        confidence = data.get("confidence_score", 0.0)
+        transcript = data.get("_transcript_lower")
+        if transcript is None:
+            transcript = data.get("transcript_segment", "").lower()
+        hits = _KEYWORD_MATCHER.scan(transcript)
+        
+        # Determine severity based on confidence and keywords
+        if confidence >= 0.9 or AlertSeverity.CRITICAL.value in hits:
+            assessment["severity"] = AlertSeverity.CRITICAL.value
+            assessment["business_impact"] = "severe"
+        elif confidence >= 0.8 or AlertSeverity.HIGH.value in hits:
+            assessment["severity"] = AlertSeverity.HIGH.value
+            assessment["business_impact"] = "significant"
+        elif confidence >= 0.7 or AlertSeverity.MEDIUM.value in hits:
+            assessment["severity"] = AlertSeverity.MEDIUM.value
+            assessment["business_impact"] = "moderate"
+        
+        # Determine alert type based on content
+        for alert_type, _ in _TYPE_KEYWORDS:
+            if alert_type.value in hits:
+                assessment["alert_type"] = alert_type.value
+                break
+        
+        # Identify risk factors
+        assessment["risk_factors"] = hits.get("risk_factors", [])
+        
+        return assessment
+    
+    def _formulate_alert(self, assessment: Dict[str, Any]) -> Dict[str, Any]:
+        """Formulate the alert message for an assessment"""
+        
+        # Create alert message based on severity and type
+        severity = assessment.get("severity", AlertSeverity.LOW.value)
+        alert_type = assessment.get("alert_type", AlertType.COMPLIANCE_VIOLATION.value)
+        business_impact = assessment.get("business_impact", "minimal")
+        
+        # Generate appropriate message based on severity
+        prefix, suffix = _SEVERITY_MESSAGES.get(severity, _SEVERITY_MESSAGES[AlertSeverity.LOW.value])
+        type_name = _ALERT_TYPE_NAMES.get(alert_type) or alert_type.replace('_', ' ').title()
+        
+        # Add business impact information
+        message = f"{prefix}: {type_name} {suffix} Business impact: {business_impact}."
+        
+        formulation = {
+            "message": message,
+            "tone": "professional",
+            "urgency": severity,
+            "clarity_score": 0.9
+        }
+        
+        return formulation
+    
+    def _plan_actions(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Plan the required actions for an assessed alert"""
+        severity = data.get("severity", AlertSeverity.LOW.value)
+        alert_type = data.get("alert_type", AlertType.COMPLIANCE_VIOLATION.value)
+        
+        actions = list(_SEVERITY_ACTIONS.get(severity, _SEVERITY_ACTIONS[AlertSeverity.LOW.value]))
+        action_required = severity in _SEVERITY_ACTIONS and severity != AlertSeverity.LOW.value
+        
+        # Add type-specific actions
+        if alert_type in _TYPE_ACTIONS:
+            actions.append(_TYPE_ACTIONS[alert_type])
+        
+        action_plan = {
+            "action_required": action_required,
+            "actions": actions,
+            "priority": severity,
+            "timeline": "immediate" if severity in [AlertSeverity.CRITICAL.value, AlertSeverity.HIGH.value] else "within 24 hours"
+        }
+        
+        return action_plan
+    
+    async def process_violation(self, violation_data: Dict[str, Any]) -> Optional[ComplianceAlert]:
+        """Process a compliance violation and generate an alert"""
+        
+        # Lowercase the transcript once for suppression and assessment
+        violation_data = {
+            **violation_data,
+            "_transcript_lower": violation_data.get("transcript_segment", "").lower()
+        }
+        
+        # Tokenized once, for the duplicate check and for later comparisons
+        tokens = self._tokenize(violation_data["_transcript_lower"])
+        
+        # Check if we should suppress this alert
+        if self._should_suppress_alert(violation_data, tokens):
+            return None
+        
+        try:
+            if self.use_llm_refinement:
+                result = await self._run_crew(violation_data)
+            else:
+                result = self._run_pipeline(violation_data)
             
-            elif severity == AlertSeverity.MEDIUM.value:
-                action_required = True
-                actions.extend([
-                    "Review the compliance concern",
-                    "Monitor for similar issues",
-                    "Update relevant policies if needed"
-                ])
+            created_at_ts = time.time()
             
-            else:  # LOW severity
-                actions = ["Monitor for escalation", "Document for future reference"]
+            # Create the alert
+            alert = ComplianceAlert(
+                id=f"alert_{self.alert_counter}",
+                speaker_id=violation_data.get('speaker_id', 'Unknown'),
+                timestamp=violation_data.get('timestamp', datetime.now().isoformat()),
+                transcript_segment=violation_data.get('transcript_segment', ''),
+                alert_type=AlertType(result.get('alert_type', AlertType.COMPLIANCE_VIOLATION.value)),
+                severity=AlertSeverity(result.get('severity', AlertSeverity.LOW.value)),
+                message=result.get('message', 'Compliance issue detected'),
+                matched_document=violation_data.get('matched_document'),
+                confidence_score=violation_data.get('confidence_score', 0.0),
+                context=violation_data.get('context'),
+                action_required=result.get('action_required', False),
+                action_items=result.get('actions', []),
+                created_at=datetime.fromtimestamp(created_at_ts).isoformat(),
+                created_at_ts=created_at_ts
+            )
             
-            # Add type-specific actions
-            if alert_type == AlertType.ETHICAL_CONCERN.value:
-                actions.append("Review ethical guidelines and training")
-            elif alert_type == AlertType.FINANCIAL.value:
-                actions.append("Review financial controls and procedures")
-            elif alert_type == AlertType.OPERATIONAL_ISSUE.value:
-                actions.append("Review operational procedures and safety protocols")
+            # Store the alert
+            alert._token_set = tokens
+            self._store_alert(alert)
             
-            action_plan = {
-                "action_required": action_required,
-                "actions": actions,
-                "priority": severity,
-                "timeline": "immediate" if severity in [AlertSeverity.CRITICAL.value, AlertSeverity.HIGH.value] else "within 24 hours"
-            }
+            # Send alert to frontend if callback is provided
+            if self.alert_callback:
+                await self.alert_callback(alert)
             
-            return json.dumps(action_plan)
+            return alert
             
-        except Exception as e:
-            return json.dumps({"error": str(e)})
+        except Exception:
+            logger.exception("Error processing violation")
+            self._error_count += 1
+            return None
     
-    async def process_violation(self, violation_data: Dict[str, Any]) -> Optional[ComplianceAlert]:
-        """Process a compliance violation and generate an alert"""
+    def _run_pipeline(self, violation_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the assessment, formulation and action tools directly, without an LLM"""
+        assessment = self._assess_violation(violation_data)
+        formulation = self._formulate_alert(assessment)
+        action_plan = self._plan_actions(assessment)
         
-        # Check if we should suppress this alert
-        if self._should_suppress_alert(violation_data):
-            return None
+        return {**assessment, **formulation, **action_plan}
+    
+    async def _run_crew(self, violation_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the CrewAI agents for LLM-refined alerts"""
         
-        # Create tasks for the crew
         assessment_task = Task(
             description=f"""
             Assess the following compliance violation:
@@ -279,11 +467,15 @@ class AlertManagerAgent:
             agent=self.alert_assessor,
             expected_output="JSON with violation assessment"
         )
+        assessment = await self._kickoff(self.alert_assessor, assessment_task)
         
+        # Formulation and action planning both depend only on the assessment,
+        # so they can run concurrently
         formulation_task = Task(
             description=f"""
-            Based on the assessment, formulate a clear alert message suitable for board members.
+            Based on the following assessment, formulate a clear alert message suitable for board members.
             Ensure the message is professional, clear, and actionable.
+            Assessment: {orjson.dumps(assessment).decode()}
             """,
             agent=self.alert_formulator,
             expected_output="JSON with alert formulation"
@@ -293,53 +485,180 @@ class AlertManagerAgent:
             description=f"""
             Determine required actions and next steps for this compliance violation.
             Consider the severity and type when planning actions.
+            Assessment: {orjson.dumps(assessment).decode()}
             """,
             agent=self.action_planner,
             expected_output="JSON with action plan"
         )
         
-        # Create and run the crew
-        crew = Crew(
-            agents=[self.alert_assessor, self.alert_formulator, self.action_planner],
-            tasks=[assessment_task, formulation_task, action_task],
-            verbose=True
+        formulation, action_plan = await asyncio.gather(
+            self._kickoff(self.alert_formulator, formulation_task),
+            self._kickoff(self.action_planner, action_task)
         )
         
+        return {**assessment, **formulation, **action_plan}
+    
+    async def _kickoff(self, agent: Agent, task: Task) -> Dict[str, Any]:
+        """Run a single-task crew and parse its JSON output"""
+        crew = Crew(agents=[agent], tasks=[task], verbose=self.verbose)
+        
+        async with self._llm_semaphore, self._llm_rate_limiter:
+            output = await crew.kickoff_async()
+        
         try:
-            result = await crew.kickoff()
-            
-            # Create the alert
-            alert = ComplianceAlert(
-                id=f"alert_{self.alert_counter}",
-                speaker_id=violation_data.get('speaker_id', 'Unknown'),
-                timestamp=violation_data.get('timestamp', datetime.now().isoformat()),
-                transcript_segment=violation_data.get('transcript_segment', ''),
-                alert_type=AlertType(result.get('alert_type', AlertType.COMPLIANCE_VIOLATION.value)),
-                severity=AlertSeverity(result.get('severity', AlertSeverity.LOW.value)),
-                message=result.get('message', 'Compliance issue detected'),
-                matched_document=violation_data.get('matched_document'),
-                confidence_score=violation_data.get('confidence_score', 0.0),
-                context=violation_data.get('context'),
-                action_required=result.get('action_required', False),
-                action_items=result.get('actions', []),
-                created_at=datetime.now().isoformat()
-            )
-            
-            # Store the alert
-            self.alerts.append(alert)
-            self.alert_counter += 1
-            
-            # Send alert to frontend if callback is provided
-            if self.alert_callback:
-                await self.alert_callback(alert)
+            return orjson.loads(output.raw)
+        except (orjson.JSONDecodeError, AttributeError, TypeError):
+            return {}
+    
+    async def process_violations_batch(self, violations: List[Dict[str, Any]]) -> List[Optional[ComplianceAlert]]:
+        """Process several violations concurrently, returning one result per violation"""
+        # LLM calls are throttled in _kickoff, so the fan-out itself is unbounded
+        results = await asyncio.gather(
+            *(self.process_violation(violation_data) for violation_data in violations),
+            return_exceptions=True
+        )
+        
+        return [None if isinstance(result, BaseException) else result for result in results]
+    
+    def _store_alert(self, alert: ComplianceAlert):
+        """Append an alert to the history and update the indexes"""
+        if len(self.alerts) == self.hot_capacity:
+            self._evict_alert(self.alerts[0])
+        
+        self.alerts.append(alert)
+        self._created_ts.append(alert.created_at_ts)
+        self._alerts_by_id[alert.id] = alert
+        self.alert_counter += 1
+        
+        recent = self._recent_by_speaker[alert.speaker_id]
+        recent.append(alert)
+        
+        # Drop alerts that have left the duplicate window
+        cutoff_ts = time.time() - self.duplicate_time_window
+        while recent[0].created_at_ts <= cutoff_ts:
+            recent.popleft()
+        
+        self._alerts_by_speaker[alert.speaker_id].append(alert)
+        self._speaker_count[alert.speaker_id] += 1
+        
+        self._severity_counts[alert.severity.value] += 1
+        self._type_counts[alert.alert_type.value] += 1
+    
+    def _evict_alert(self, alert: ComplianceAlert):
+        """Hand the oldest in-memory alert over to the history store"""
+        # It is the oldest alert overall, so also the oldest of its speaker
+        self._alerts_by_id.pop(alert.id, None)
+        self._alerts_by_speaker[alert.speaker_id].popleft()
+        recent = self._recent_by_speaker[alert.speaker_id]
+        if recent and recent[0] is alert:
+            recent.popleft()
+        
+        self._cold_pending.append(alert)
+        self._cold_pending_event.set()
+        self._cold_flushed_event.clear()
+        self._evicted_count += 1
+        
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_to_disk())
+    
+    async def _flush_to_disk(self):
+        """Background task writing evicted alerts to the history store"""
+        while True:
+            await self._cold_pending_event.wait()
+            self._cold_pending_event.clear()
             
-            return alert
+            # Drain everything queued so far, one transaction per batch
+            self._history_error = None
+            attempt = 0
+            while self._cold_pending:
+                batch = self._cold_pending[:self.history_batch_size]
+                try:
+                    await self._write_history_batch(batch)
+                except Exception as e:
+                    logger.exception("Error writing alert history")
+                    self._error_count += 1
+                    attempt += 1
+                    if attempt > self.history_max_retries:
+                        # Unwritten alerts stay pending (and listed by get_alerts)
+                        # until the next eviction tries again
+                        self._history_error = e
+                        break
+                    await asyncio.sleep(self.history_retry_delay * 2 ** (attempt - 1))
+                    continue
+                
+                attempt = 0
+                del self._cold_pending[:len(batch)]
             
-        except Exception as e:
-            print(f"Error processing violation: {e}")
-            return None
+            self._cold_flushed_event.set()
     
-    def _should_suppress_alert(self, violation_data: Dict[str, Any]) -> bool:
+    async def _write_history_batch(self, batch: List[ComplianceAlert]):
+        """Write a batch of evicted alerts, including acknowledgements made meanwhile"""
+        loop = asyncio.get_running_loop()
+        records = [self._to_record(alert) for alert in batch]
+        
+        while records:
+            await loop.run_in_executor(self._history_executor, self._history_store.append, records)
+            # acknowledge_alert may have updated alerts of this batch while it
+            # was being written; those are written again before leaving pending
+            batch = [
+                alert for alert, record in zip(batch, records)
+                if alert.acknowledged_at != record["acknowledged_at"]
+            ]
+            records = [self._to_record(alert) for alert in batch]
+    
+    async def flush_history(self):
+        """Wait until every evicted alert has been written to the history store.
+        
+        Raises RuntimeError if the last flush gave up with alerts still unwritten.
+        """
+        await self._cold_flushed_event.wait()
+        if self._history_error is not None:
+            raise RuntimeError("Evicted alerts could not be written to the history store") from self._history_error
+    
+    @staticmethod
+    def _to_record(alert: ComplianceAlert) -> Dict[str, Any]:
+        return alert.to_pydantic().model_dump(mode="json")
+    
+    @staticmethod
+    def _from_record(record: Dict[str, Any]) -> ComplianceAlert:
+        return ComplianceAlert(**{
+            **record,
+            "alert_type": AlertType(record["alert_type"]),
+            "severity": AlertSeverity(record["severity"])
+        })
+    
+    async def _cold_alerts(self,
+                           cutoff_ts: Optional[float],
+                           speaker_filter: Optional[str],
+                           severity_filter: Optional[AlertSeverity]) -> List[ComplianceAlert]:
+        """Evicted alerts matching the filters, oldest first"""
+        # Evicted alerts are all older than the in-memory ones
+        if not self._evicted_count or (cutoff_ts is not None and self.alerts and cutoff_ts >= self.alerts[0].created_at_ts):
+            return []
+        
+        pending = [
+            alert for alert in self._cold_pending
+            if (cutoff_ts is None or alert.created_at_ts > cutoff_ts)
+            and (not speaker_filter or alert.speaker_id == speaker_filter)
+            and (not severity_filter or alert.severity == severity_filter)
+        ]
+        pending_ids = {alert.id for alert in self._cold_pending}
+        
+        # SQLite is read on the history thread, queued behind pending writes
+        records = await asyncio.get_running_loop().run_in_executor(
+            self._history_executor,
+            functools.partial(
+                self._history_store.query,
+                since_ts=cutoff_ts,
+                speaker_id=speaker_filter or None,
+                severity=severity_filter.value if severity_filter else None
+            )
+        )
+        stored = [self._from_record(record) for record in records if record["id"] not in pending_ids]
+        
+        return stored + pending
+    
+    def _should_suppress_alert(self, violation_data: Dict[str, Any], tokens: FrozenSet[str]) -> bool:
         """Check if an alert should be suppressed based on various criteria"""
         
         # Check severity threshold
@@ -347,96 +666,128 @@ class AlertManagerAgent:
         if confidence < self.severity_thresholds[AlertSeverity.LOW]:
             return True
         
+        speaker_id = violation_data.get('speaker_id', '')
+        
         # Check for duplicates if suppression is enabled
         if self.suppress_duplicates:
-            speaker_id = violation_data.get('speaker_id', '')
-            transcript = violation_data.get('transcript_segment', '')
-            current_time = datetime.now()
-            
-            # Check recent alerts from the same speaker
-            recent_alerts = [
-                alert for alert in self.alerts
-                if alert.speaker_id == speaker_id and
-                (current_time - datetime.fromisoformat(alert.created_at)).seconds < self.duplicate_time_window
-            ]
-            
-            # Check for similar content
-            for alert in recent_alerts:
-                if self._is_similar_content(transcript, alert.transcript_segment):
+            # Check for similar content in recent alerts from the same speaker,
+            # newest first, stopping at the first one outside the window
+            cutoff_ts = time.time() - self.duplicate_time_window
+            for alert in reversed(self._recent_by_speaker[speaker_id]):
+                if alert.created_at_ts <= cutoff_ts:
+                    break
+                if self._is_similar_content(tokens, alert._token_set):
                     return True
         
         # Check maximum alerts per speaker
-        speaker_id = violation_data.get('speaker_id', '')
-        speaker_alert_count = len([alert for alert in self.alerts if alert.speaker_id == speaker_id])
-        if speaker_alert_count >= self.max_alerts_per_speaker:
+        if self._speaker_count[speaker_id] >= self.max_alerts_per_speaker:
             return True
         
         return False
     
-    def _is_similar_content(self, content1: str, content2: str, threshold: float = 0.8) -> bool:
-        """Check if two content pieces are similar"""
+    @staticmethod
+    def _tokenize(content_lower: str) -> FrozenSet[str]:
+        """Word set of already lowercased content, used for similarity checks"""
+        return frozenset(content_lower.split())
+    
+    def _is_similar_content(self, words1: FrozenSet[str], words2: FrozenSet[str], threshold: float = 0.8) -> bool:
+        """Check if two content pieces, given as word sets, are similar"""
         # Simple similarity check - in production, use more sophisticated NLP
-        words1 = set(content1.lower().split())
-        words2 = set(content2.lower().split())
-        
         if not words1 or not words2:
             return False
         
-        intersection = words1.intersection(words2)
-        union = words1.union(words2)
+        # Jaccard similarity can never exceed the ratio of the set sizes
+        size1, size2 = len(words1), len(words2)
+        if min(size1, size2) < threshold * max(size1, size2):
+            return False
         
-        similarity = len(intersection) / len(union)
+        similarity = len(words1 & words2) / len(words1 | words2)
         return similarity >= threshold
     
-    def get_alerts(self, 
-                   severity_filter: Optional[AlertSeverity] = None,
-                   speaker_filter: Optional[str] = None,
-                   time_range_minutes: Optional[int] = None) -> List[ComplianceAlert]:
+    async def get_alerts(self, 
+                         severity_filter: Optional[AlertSeverity] = None,
+                         speaker_filter: Optional[str] = None,
+                         time_range_minutes: Optional[int] = None) -> List[ComplianceAlert]:
         """Get filtered alerts"""
-        filtered_alerts = self.alerts.copy()
+        cutoff_ts = None
+        if time_range_minutes:
+            cutoff_ts = time.time() - (time_range_minutes * 60)
+        
+        # Apply speaker filter via the per-speaker index
+        if speaker_filter:
+            filtered_alerts = list(self._alerts_by_speaker.get(speaker_filter, ()))
+            
+            # Apply time range filter
+            if cutoff_ts is not None:
+                filtered_alerts = [alert for alert in filtered_alerts if alert.created_at_ts > cutoff_ts]
+        elif cutoff_ts is not None:
+            # Alerts are stored in creation order, so the time range is a suffix
+            start = bisect.bisect_right(self._created_ts, cutoff_ts)
+            filtered_alerts = list(itertools.islice(self.alerts, start, None))
+        else:
+            filtered_alerts = list(self.alerts)
         
         # Apply severity filter
         if severity_filter:
             filtered_alerts = [alert for alert in filtered_alerts if alert.severity == severity_filter]
         
-        # Apply speaker filter
-        if speaker_filter:
-            filtered_alerts = [alert for alert in filtered_alerts if alert.speaker_id == speaker_filter]
-        
-        # Apply time range filter
-        if time_range_minutes:
-            cutoff_time = datetime.now().timestamp() - (time_range_minutes * 60)
-            filtered_alerts = [
-                alert for alert in filtered_alerts
-                if datetime.fromisoformat(alert.created_at).timestamp() > cutoff_time
-            ]
+        # Older alerts come from the on-disk history. Alerts evicted while it is
+        # read may show up there too; the in-memory copy listed above wins.
+        hot_ids = {alert.id for alert in filtered_alerts}
+        cold_alerts = await self._cold_alerts(cutoff_ts, speaker_filter, severity_filter)
+        return [alert for alert in cold_alerts if alert.id not in hot_ids] + filtered_alerts
+    
+    async def acknowledge_alert(self, alert_id: str, acknowledged_by: str) -> bool:
+        """Acknowledge an alert, in memory or in the on-disk history"""
+        alert = self._alerts_by_id.get(alert_id)
+        if alert is None:
+            # Evicted alerts are either still waiting to be written or stored
+            alert = next((pending for pending in self._cold_pending if pending.id == alert_id), None)
+        if alert is None:
+            return await self._acknowledge_stored_alert(alert_id, acknowledged_by)
         
-        return filtered_alerts
+        if not alert.acknowledged:
+            self._ack_count += 1
+        alert.acknowledged = True
+        alert.acknowledged_by = acknowledged_by
+        alert.acknowledged_at = datetime.now().isoformat()
+        return True
     
-    def acknowledge_alert(self, alert_id: str, acknowledged_by: str) -> bool:
-        """Acknowledge an alert"""
-        for alert in self.alerts:
-            if alert.id == alert_id:
-                alert.acknowledged = True
-                alert.acknowledged_by = acknowledged_by
-                alert.acknowledged_at = datetime.now().isoformat()
-                return True
-        return False
+    async def _acknowledge_stored_alert(self, alert_id: str, acknowledged_by: str) -> bool:
+        """Acknowledge an alert that has already been written to the history store"""
+        acknowledged_at = datetime.now().isoformat()
+        
+        def acknowledge_record() -> Optional[bool]:
+            # Runs on the history thread; None if the alert is unknown, else
+            # whether it had been acknowledged before
+            record = self._history_store.get(alert_id)
+            if record is None:
+                return None
+            
+            was_acknowledged = record["acknowledged"]
+            record["acknowledged"] = True
+            record["acknowledged_by"] = acknowledged_by
+            record["acknowledged_at"] = acknowledged_at
+            self._history_store.append([record])
+            return was_acknowledged
+        
+        was_acknowledged = await asyncio.get_running_loop().run_in_executor(self._history_executor, acknowledge_record)
+        if was_acknowledged is None:
+            return False
+        
+        if not was_acknowledged:
+            self._ack_count += 1
+        return True
     
     def get_alert_statistics(self) -> Dict[str, Any]:
         """Get statistics about alerts"""
-        total_alerts = len(self.alerts)
-        severity_counts = {severity.value: 0 for severity in AlertSeverity}
-        type_counts = {alert_type.value: 0 for alert_type in AlertType}
-        
-        for alert in self.alerts:
-            severity_counts[alert.severity.value] += 1
-            type_counts[alert.alert_type.value] += 1
+        total_alerts = self.alert_counter
         
         return {
             "total_alerts": total_alerts,
-            "severity_distribution": severity_counts,
-            "type_distribution": type_counts,
-            "acknowledged_count": len([alert for alert in self.alerts if alert.acknowledged]),
-            "pending_count": len([alert for alert in self.alerts if not alert.acknowledged])
-        } 
\ No newline at end of file
+            "severity_distribution": {severity.value: self._severity_counts[severity.value] for severity in AlertSeverity},
+            "type_distribution": {alert_type.value: self._type_counts[alert_type.value] for alert_type in AlertType},
+            "acknowledged_count": self._ack_count,
+            "pending_count": total_alerts - self._ack_count,
+            "error_count": self._error_count
+        }
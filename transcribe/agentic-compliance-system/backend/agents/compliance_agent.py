@@ -1,13 +1,51 @@
-from crewai import Agent, Task, Crew
-from crewai.llms import Gemini
 import pinecone
 import os
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-import json
 import asyncio
-from pydantic import BaseModel
+import logging
+from dataclasses import dataclass
+from functools import cached_property
+import numpy as np
+from pydantic import BaseModel, TypeAdapter
 import google.generativeai as genai
+from aiolimiter import AsyncLimiter
+
+from .document_store import DocumentStore
+from .keyword_matcher import KeywordMatcher
+from .query_cache import QueryCache
+from .recent_match_cache import RecentMatchCache
+
+logger = logging.getLogger(__name__)
+
+# Fixed preamble for document analysis, sent as the system instruction so every
+# request shares the same prefix and only the documents and transcript vary
+# (the response schema already spells out the fields, so they are not listed)
+_ANALYSIS_INSTRUCTIONS = """
+Check the board meeting transcript segment against each regulatory document.
+Report one finding per document it contradicts: type esg/financial/legal/ethical/operational, severity low/medium/high/critical, a short actionable description, confidence 0-1.
+Return [] if none.
+"""
+
+# Documents are indexed in chunks of about 512 tokens (~0.75 words per token)
+_CHUNK_WORDS = 384
+
+_SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+
+# Keyword-based severity for the context analysis; buckets in descending severity
+_CONTEXT_SEVERITY_MATCHER = KeywordMatcher({
+    "high": ("fraud", "bribery", "corruption", "illegal", "criminal", "violation"),
+    "medium": ("risk", "concern", "issue", "problem", "non-compliance")
+})
+
+def _quantize_embedding(embedding: List[float]) -> tuple:
+    """Symmetric int8 quantization of an embedding, returned as (values, scale)"""
+    vector = np.asarray(embedding, dtype=np.float32)
+    scale = float(np.abs(vector).max()) / 127 or 1.0
+    return np.round(vector / scale).astype(np.int8), scale
+
+def _dequantize_embedding(values: np.ndarray, scale: float) -> List[float]:
+    return (values.astype(np.float32) * scale).tolist()
 
 class ComplianceViolation(BaseModel):
     """Model for compliance violation alerts"""
@@ -20,31 +58,74 @@ class ComplianceViolation(BaseModel):
     confidence_score: float
     context: Optional[str] = None
 
+class ComplianceFinding(BaseModel):
+    """Structured Gemini output for one violated document"""
+    document_title: str
+    type: str
+    severity: str
+    description: str
+    confidence: float
+
+_FINDINGS_ADAPTER = TypeAdapter(List[ComplianceFinding])
+
+@dataclass(slots=True)
+class RawViolation:
+    """A violation as it moves through the analysis steps, before it becomes an alert"""
+    document_title: str
+    type: str
+    severity: str
+    description: str
+    confidence: float
+    context: str = ""
+    business_impact: str = "minimal"
+
 class ComplianceAgent:
-    """Real-time compliance monitoring agent using CrewAI"""
+    """Real-time compliance monitoring agent using Pinecone retrieval and Gemini"""
     
     def __init__(self, pinecone_api_key: str, pinecone_index_name: str, gemini_api_key: str):
         self.pinecone_api_key = pinecone_api_key
         self.pinecone_index_name = pinecone_index_name
         self.gemini_api_key = gemini_api_key
         
-        # Initialize Pinecone
-        pinecone.init(api_key=pinecone_api_key, environment="gcp-starter")
-        self.index = pinecone.Index(pinecone_index_name)
+        # Pinecone and the Gemini model are set up on first use, or by startup()
         
-        # Initialize Gemini
+        # Chunk text lives here rather than in Pinecone metadata
+        self.document_store = DocumentStore(os.getenv("DOCUMENT_STORE_PATH", "documents.db"))
+        
+        # Repeated utterances are common in live meetings, so cache the embedding
+        # and the Pinecone matches per normalized segment. Embeddings stay valid
+        # when documents are added; query results do not.
+        self._embedding_cache = QueryCache(max_size=2000, ttl_seconds=600)
+        self._query_cache = QueryCache(max_size=2000, ttl_seconds=600)
+        # Reworded repeats miss the text cache but embed almost identically
+        self._recent_matches = RecentMatchCache(capacity=512, min_similarity=0.95)
+        # Gemini findings per normalized segment, so exact repeats (greetings,
+        # boilerplate disclaimers) skip retrieval and analysis entirely
+        self._findings_cache = QueryCache(max_size=2000, ttl_seconds=600)
+        
+        # Initialize Gemini; configure only records the key and makes no request
         genai.configure(api_key=gemini_api_key)
-        self.gemini_model = genai.GenerativeModel('gemini-1.5-flash')
+        self.embedding_model = "models/embedding-001"
         
-        # Initialize LLM for CrewAI
-        self.llm = Gemini(
-            api_key=gemini_api_key,
-            model="gemini-1.5-flash",
-            temperature=0.1
-        )
+        # Bound in-flight Gemini requests across concurrently processed segments
+        self.max_concurrent_gemini = int(os.getenv("GEMINI_CONCURRENCY", "8"))
+        self._gemini_semaphore = asyncio.Semaphore(self.max_concurrent_gemini)
+        # Bound segments in flight so bursts queue here instead of piling up
+        # embedding, document store and Pinecone work all at once
+        self.max_concurrent_segments = int(os.getenv("COMPLIANCE_SEGMENT_CONCURRENCY", "32"))
+        self._segment_semaphore = asyncio.Semaphore(self.max_concurrent_segments)
+        # Bound in-flight Pinecone queries; each holds a worker thread
+        self.max_concurrent_pinecone = int(os.getenv("PINECONE_CONCURRENCY", "8"))
+        self._pinecone_semaphore = asyncio.Semaphore(self.max_concurrent_pinecone)
         
-        # Create CrewAI agents
-        self._create_agents()
+        # Pace requests below the provider quotas instead of running into 429s.
+        # Each limiter allows a burst of two seconds' worth of requests.
+        self.gemini_requests_per_second = float(os.getenv("GEMINI_RPS", "8"))
+        self.gemini_tokens_per_minute = int(os.getenv("GEMINI_TPM", "1000000"))
+        self.pinecone_requests_per_second = float(os.getenv("PINECONE_RPS", "100"))
+        self._gemini_rate_limiter = AsyncLimiter(2 * self.gemini_requests_per_second, 2)
+        self._gemini_token_limiter = AsyncLimiter(self.gemini_tokens_per_minute, 60)
+        self._pinecone_rate_limiter = AsyncLimiter(2 * self.pinecone_requests_per_second, 2)
         
         # Compliance categories and their keywords
         self.compliance_categories = {
@@ -54,324 +135,289 @@ class ComplianceAgent:
             "ethical": ["ethical", "conflict", "interest", "bribery", "corruption", "whistleblower"],
             "operational": ["operational", "safety", "security", "quality", "standards", "procedures"]
         }
+        self._category_matcher = KeywordMatcher(self.compliance_categories)
     
-    def _create_agents(self):
-        """Create the CrewAI agents for compliance monitoring"""
-        
-        # Compliance Analysis Agent
-        self.compliance_analyst = Agent(
-            role="Compliance Analyst",
-            goal="Analyze transcript segments for potential compliance violations by comparing against regulatory documents",
-            backstory="""You are an expert compliance analyst with deep knowledge of ESG, financial, legal, and ethical regulations. 
-            You specialize in identifying potential violations in real-time conversations by matching content against stored regulatory documents.""",
-            verbose=True,
-            allow_delegation=False,
-            llm=self.llm,
-            tools=[self._analyze_compliance_tool]
-        )
-        
-        # Alert Generation Agent
-        self.alert_generator = Agent(
-            role="Alert Generator",
-            goal="Generate clear, actionable compliance alerts with appropriate severity levels",
-            backstory="""You are an expert in risk communication and alert generation. You create clear, 
-            actionable alerts that help board members understand compliance risks without causing unnecessary alarm.""",
-            verbose=True,
-            allow_delegation=False,
-            llm=self.llm,
-            tools=[self._generate_alert_tool]
+    def categorize(self, text: str) -> frozenset:
+        """Return the compliance categories whose keywords occur in the text, in one pass"""
+        return self._category_matcher.matched_buckets(text.lower())
+    
+    @cached_property
+    def index(self):
+        """Pinecone index, connected on first use"""
+        pinecone.init(api_key=self.pinecone_api_key, environment="gcp-starter")
+        return pinecone.Index(self.pinecone_index_name)
+    
+    @cached_property
+    def gemini_model(self) -> genai.GenerativeModel:
+        return genai.GenerativeModel(
+            'gemini-1.5-flash',
+            system_instruction=_ANALYSIS_INSTRUCTIONS,
+            generation_config=genai.GenerationConfig(
+                response_mime_type="application/json",
+                response_schema=list[ComplianceFinding],
+                temperature=0.1,
+                # Enough for a finding on each of the top_k documents
+                max_output_tokens=512
+            )
         )
+    
+    async def startup(self):
+        """Connect to Pinecone and Gemini without blocking the event loop"""
+        await asyncio.to_thread(lambda: (self.index, self.gemini_model))
         
-        # Context Analysis Agent
-        self.context_analyzer = Agent(
-            role="Context Analyzer",
-            goal="Analyze the broader context of potential violations to determine severity and relevance",
-            backstory="""You are an expert in understanding business context and determining the real-world 
-            implications of potential compliance issues. You help distinguish between minor infractions and serious violations.""",
-            verbose=True,
-            allow_delegation=False,
-            llm=self.llm,
-            tools=[self._analyze_context_tool]
-        )
+        # The SDKs keep their own connection pools (urllib3 for Pinecone, gRPC for
+        # Gemini) and do not accept a shared HTTP client, so open those
+        # connections now rather than on the first segment. count_tokens is free
+        # and goes through the same async channel as generation.
+        try:
+            await asyncio.to_thread(self.index.describe_index_stats)
+            await self.gemini_model.count_tokens_async("warmup")
+        except Exception:
+            logger.warning("Connection warmup failed; connecting on first use", exc_info=True)
     
-    def _analyze_compliance_tool(self, transcript_segment: str, speaker_id: str, timestamp: str) -> str:
-        """Tool for analyzing compliance in transcript segments"""
+    async def _analyze_compliance(self, transcript_segment: str) -> List[RawViolation]:
+        """Match a transcript segment against stored documents and analyze each match"""
         try:
-            # Search for relevant documents in Pinecone
-            # Get embeddings for the transcript segment
-            transcript_embedding = self._get_embedding(transcript_segment)
-            
-            # Query Pinecone
-            query_response = self.index.query(
-                vector=transcript_embedding,
-                top_k=5,
-                include_metadata=True
-            )
-            
-            # Filter documents by relevance threshold
-            relevant_docs = []
-            for match in query_response.matches:
-                if match.score > 0.7:  # Adjust threshold as needed
-                    relevant_docs.append({
-                        "content": match.metadata.get("content", ""),
-                        "title": match.metadata.get("title", "Unknown"),
-                        "score": match.score
-                    })
+            cache_key = QueryCache.make_key(transcript_segment)
+            findings = self._findings_cache.get(cache_key)
+            if findings is None:
+                findings = await self._find_compliance_findings(transcript_segment, cache_key)
+                self._findings_cache.set(cache_key, findings)
             
-            if not relevant_docs:
-                return json.dumps({
-                    "violation_detected": False,
-                    "reason": "No relevant regulatory documents found"
-                })
-            
-            # Analyze each relevant document
-            violations = []
-            for doc in relevant_docs:
-                analysis = self._analyze_document_compliance(
-                    transcript_segment, doc["content"], doc["score"]
+            # Fresh violations each time: later steps update them in place
+            return [
+                RawViolation(
+                    document_title=finding.document_title,
+                    type=finding.type,
+                    severity=finding.severity,
+                    description=finding.description,
+                    confidence=finding.confidence
                 )
-                if analysis["is_violation"]:
-                    analysis["document_title"] = doc["title"]
-                    violations.append(analysis)
+                for finding in findings
+            ]
             
-            return json.dumps({
-                "violation_detected": len(violations) > 0,
-                "violations": violations,
-                "speaker_id": speaker_id,
-                "timestamp": timestamp
-            })
+        except Exception:
+            logger.exception("Error analyzing compliance")
+            return []
+    
+    async def _find_compliance_findings(self, transcript_segment: str, cache_key: str) -> List[ComplianceFinding]:
+        """Retrieve the documents relevant to a segment and have Gemini check them"""
+        # Search for relevant documents in Pinecone
+        matches = self._query_cache.get(cache_key)
+        
+        if matches is None:
+            # Get embeddings for the transcript segment
+            transcript_embedding = await self._get_embedding(transcript_segment)
             
-        except Exception as e:
-            return json.dumps({
-                "error": str(e),
-                "violation_detected": False
+            # Only search documents of the categories the segment mentions, plus
+            # uncategorized ones; without a category signal search everything
+            categories = self.categorize(transcript_segment)
+            search_filter = None
+            if categories:
+                search_filter = {"category": {"$in": sorted(categories | {"general"})}}
+            scope = tuple(sorted(categories))
+            
+            # Reuse the matches of a near-identical recent query, else query Pinecone
+            matches = self._recent_matches.lookup(transcript_embedding, scope)
+            if matches is None:
+                matches = await self._query_index(transcript_embedding, search_filter)
+                self._recent_matches.add(transcript_embedding, matches, scope)
+            self._query_cache.set(cache_key, matches)
+        
+        # Filter documents by relevance threshold
+        relevant_matches = [match for match in matches if match.score > 0.7]  # Adjust threshold as needed
+        contents = await asyncio.to_thread(
+            self.document_store.get_many, [match.id for match in relevant_matches]
+        )
+        
+        relevant_docs = []
+        for match in relevant_matches:
+            relevant_docs.append({
+                # Documents indexed before the document store kept content in metadata
+                "content": contents.get(match.id) or match.metadata.get("content", ""),
+                "title": match.metadata.get("title", "Unknown"),
+                "score": match.score
             })
+        
+        # No relevant regulatory documents found
+        if not relevant_docs:
+            return []
+        
+        # One Gemini call covers every relevant document
+        return await self._analyze_document_compliance(transcript_segment, relevant_docs)
     
-    def _get_embedding(self, text: str) -> List[float]:
-        """Get embedding for text using Gemini"""
-        try:
-            embedding_model = genai.GenerativeModel('embedding-001')
-            result = embedding_model.embed_content(text)
-            return result.embedding
-        except Exception as e:
-            print(f"Error getting embedding: {e}")
-            # Return a dummy embedding if there's an error
-            return [0.0] * 768
+    async def _query_index(self, vector: List[float], search_filter: Optional[Dict[str, Any]]) -> List[Any]:
+        """Query Pinecone for the top matches of one vector, off the event loop"""
+        options = {"top_k": 5, "include_metadata": True}
+        if search_filter:
+            options["filter"] = search_filter
+        
+        async with self._pinecone_semaphore, self._pinecone_rate_limiter:
+            response = await asyncio.to_thread(self.index.query, vector=vector, **options)
+        return response.matches
     
-    def _generate_alert_tool(self, violation_data: str) -> str:
-        """Tool for generating formatted alerts"""
-        try:
-            data = json.loads(violation_data)
-            
-            if not data.get("violation_detected", False):
-                return json.dumps({"alert": None})
-            
-            violations = data.get("violations", [])
-            alerts = []
-            
-            for violation in violations:
-                alert = {
-                    "speaker_id": data.get("speaker_id"),
-                    "timestamp": data.get("timestamp"),
-                    "severity": violation.get("severity", "medium"),
-                    "violation_type": violation.get("type", "compliance"),
-                    "message": violation.get("description", "Potential compliance issue detected"),
-                    "confidence": violation.get("confidence", 0.0),
-                    "matched_document": violation.get("document_title", "Unknown"),
-                    "context": violation.get("context", "")
-                }
-                alerts.append(alert)
-            
-            return json.dumps({"alerts": alerts})
-            
-        except Exception as e:
-            return json.dumps({"error": str(e), "alert": None})
+    async def _get_embedding(self, text: str) -> List[float]:
+        """Get embedding for text using Gemini.
+        
+        Errors propagate rather than falling back to a placeholder vector, so
+        nothing retrieved or analyzed for a failed embedding gets cached.
+        """
+        cache_key = QueryCache.make_key(text)
+        cached = self._embedding_cache.get(cache_key)
+        if cached is not None:
+            return _dequantize_embedding(*cached)
+        
+        async with self._gemini_rate_limiter:
+            embedding = (await asyncio.to_thread(self._get_embeddings_batch, [text]))[0]
+        # Held as int8 (768 bytes instead of a ~25 KB list of floats)
+        self._embedding_cache.set(cache_key, _quantize_embedding(embedding))
+        return embedding
     
-    def _analyze_context_tool(self, transcript_segment: str, violation_type: str) -> str:
-        """Tool for analyzing context and determining severity"""
-        try:
-            # Analyze the context to determine severity
-            context_analysis = {
-                "severity": "low",
-                "context": "",
-                "business_impact": "minimal"
-            }
-            
-            # Simple keyword-based severity analysis
-            high_severity_keywords = ["fraud", "bribery", "corruption", "illegal", "criminal", "violation"]
-            medium_severity_keywords = ["risk", "concern", "issue", "problem", "non-compliance"]
-            
-            segment_lower = transcript_segment.lower()
-            
-            if any(keyword in segment_lower for keyword in high_severity_keywords):
-                context_analysis["severity"] = "high"
-                context_analysis["business_impact"] = "significant"
-            elif any(keyword in segment_lower for keyword in medium_severity_keywords):
-                context_analysis["severity"] = "medium"
-                context_analysis["business_impact"] = "moderate"
-            
-            context_analysis["context"] = f"Analysis of '{transcript_segment}' for {violation_type} compliance"
-            
-            return json.dumps(context_analysis)
-            
-        except Exception as e:
-            return json.dumps({"error": str(e), "severity": "low"})
+    def _get_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for several texts in one Gemini request"""
+        result = genai.embed_content(model=self.embedding_model, content=texts)
+        return result["embedding"]
     
-    def _analyze_document_compliance(self, transcript: str, document_content: str, similarity_score: float) -> Dict[str, Any]:
-        """Analyze compliance between transcript and document using Gemini"""
-        try:
-            prompt = f"""
-            Analyze the following transcript segment against the regulatory document content:
-            
-            Transcript: "{transcript}"
-            Document: "{document_content[:500]}..."
-            Similarity Score: {similarity_score}
-            
-            Determine if this represents a potential compliance violation. Consider:
-            1. Does the transcript content contradict or violate the document's requirements?
-            2. What is the severity level (low/medium/high/critical)?
-            3. What type of compliance issue is this?
-            
-            Return a JSON response with:
-            - is_violation: boolean
-            - type: string (esg/financial/legal/ethical/operational)
-            - severity: string (low/medium/high/critical)
-            - description: string
-            - confidence: float (0-1)
-            """
-            
-            response = self.gemini_model.generate_content(prompt)
-            response_text = response.text
-            
-            # Try to parse JSON from response
-            try:
-                # Extract JSON from response if it's wrapped in markdown
-                if "```json" in response_text:
-                    json_start = response_text.find("```json") + 7
-                    json_end = response_text.find("```", json_start)
-                    json_str = response_text[json_start:json_end].strip()
-                else:
-                    json_str = response_text.strip()
-                
-                result = json.loads(json_str)
-                return result
-            except json.JSONDecodeError:
-                # Fallback to simple analysis
-                return {
-                    "is_violation": similarity_score > 0.8,
-                    "type": "compliance",
-                    "severity": "medium" if similarity_score > 0.8 else "low",
-                    "description": f"Potential compliance issue with similarity score {similarity_score:.2f}",
-                    "confidence": similarity_score
-                }
-                
-        except Exception as e:
-            return {
-                "is_violation": False,
-                "type": "unknown",
-                "severity": "low",
-                "description": f"Analysis error: {str(e)}",
-                "confidence": 0.0
-            }
+    def _generate_alert_tool(self, violations: List[RawViolation], transcript_segment: str,
+                             speaker_id: str, timestamp: str) -> List[ComplianceViolation]:
+        """Tool for generating formatted alerts"""
+        return [
+            ComplianceViolation(
+                speaker_id=speaker_id,
+                timestamp=timestamp,
+                transcript_segment=transcript_segment,
+                violation_type=violation.type or "compliance",
+                severity=violation.severity or "medium",
+                matched_document=violation.document_title or "Unknown",
+                confidence_score=violation.confidence,
+                context=violation.context
+            )
+            for violation in violations
+        ]
     
-    async def process_transcript_segment(self, transcript: str, speaker_id: str, timestamp: str) -> List[ComplianceViolation]:
-        """Process a transcript segment for compliance violations"""
+    def _analyze_context_tool(self, transcript_segment: str, violation: RawViolation):
+        """Tool for analyzing context and determining severity"""
+        # Simple keyword-based severity analysis, one pass over the segment
+        severity_hits = _CONTEXT_SEVERITY_MATCHER.scan(transcript_segment.lower())
         
-        # Create tasks for the crew
-        analysis_task = Task(
-            description=f"""
-            Analyze the following transcript segment for compliance violations:
-            Speaker: {speaker_id}
-            Time: {timestamp}
-            Content: "{transcript}"
-            
-            Search the vector database for relevant regulatory documents and determine if there are any compliance issues.
-            """,
-            agent=self.compliance_analyst,
-            expected_output="JSON with violation analysis results"
-        )
+        severity = "low"
+        if "high" in severity_hits:
+            severity = "high"
+            violation.business_impact = "significant"
+        elif "medium" in severity_hits:
+            severity = "medium"
+            violation.business_impact = "moderate"
         
-        context_task = Task(
-            description=f"""
-            If violations are detected, analyze the context and determine severity levels.
-            Consider business impact and real-world implications.
-            """,
-            agent=self.context_analyzer,
-            expected_output="JSON with context analysis and severity assessment"
-        )
+        # Keyword context can raise, but never lower, the severity Gemini assigned
+        if _SEVERITY_RANK[severity] > _SEVERITY_RANK.get(violation.severity, 0):
+            violation.severity = severity
         
-        alert_task = Task(
-            description=f"""
-            Generate clear, actionable alerts for any detected violations.
-            Include speaker ID, timestamp, severity, and specific violation details.
-            """,
-            agent=self.alert_generator,
-            expected_output="JSON with formatted alerts"
+        violation.context = f"Analysis of '{transcript_segment}' for {violation.type} compliance"
+    
+    async def _analyze_document_compliance(self, transcript: str, documents: List[Dict[str, Any]]) -> List[ComplianceFinding]:
+        """Analyze compliance between a transcript and its matched documents using Gemini"""
+        # Documents first: segments matched to the same documents share a prefix
+        document_sections = "\n".join(
+            f'Document "{doc["title"]}": {doc["content"]}'
+            for doc in documents
         )
+        prompt = f'{document_sections}\nTranscript: "{transcript}"'
         
-        # Create and run the crew
-        crew = Crew(
-            agents=[self.compliance_analyst, self.context_analyzer, self.alert_generator],
-            tasks=[analysis_task, context_task, alert_task],
-            verbose=True
-        )
+        async with self._gemini_semaphore, self._gemini_rate_limiter:
+            response = await self.gemini_model.generate_content_async(prompt)
+        
+        # Token usage is only known once the response is in; charging it here makes
+        # segments wait for the per-minute budget to refill once it is spent
+        used_tokens = min(response.usage_metadata.total_token_count, self.gemini_tokens_per_minute)
+        await self._gemini_token_limiter.acquire(used_tokens)
         
+        return _FINDINGS_ADAPTER.validate_json(response.text)
+    
+    async def process_transcript_segment(self, transcript: str, speaker_id: str, timestamp: str) -> List[ComplianceViolation]:
+        """Process a transcript segment for compliance violations"""
+        async with self._segment_semaphore:
+            return await self._process_segment(transcript, speaker_id, timestamp)
+    
+    async def process_transcript_segments(self, segments: List[Dict[str, str]]) -> List[List[ComplianceViolation]]:
+        """Process several segments concurrently, returning the violations of each in order"""
+        return await asyncio.gather(*(
+            self.process_transcript_segment(segment["transcript"], segment["speaker_id"], segment["timestamp"])
+            for segment in segments
+        ))
+    
+    async def _process_segment(self, transcript: str, speaker_id: str, timestamp: str) -> List[ComplianceViolation]:
         try:
-            result = await crew.kickoff()
-            
-            # Parse the result and convert to ComplianceViolation objects
-            violations = []
+            violations = await self._analyze_compliance(transcript)
             
-            # Extract alerts from the result
-            # This is a simplified parsing - you might need to adjust based on actual output format
-            if "alerts" in result:
-                for alert_data in result["alerts"]:
-                    violation = ComplianceViolation(
-                        speaker_id=alert_data.get("speaker_id", speaker_id),
-                        timestamp=alert_data.get("timestamp", timestamp),
-                        transcript_segment=transcript,
-                        violation_type=alert_data.get("violation_type", "compliance"),
-                        severity=alert_data.get("severity", "medium"),
-                        matched_document=alert_data.get("matched_document"),
-                        confidence_score=alert_data.get("confidence", 0.0),
-                        context=alert_data.get("context")
-                    )
-                    violations.append(violation)
+            for violation in violations:
+                self._analyze_context_tool(transcript, violation)
             
-            return violations
+            return self._generate_alert_tool(violations, transcript, speaker_id, timestamp)
             
-        except Exception as e:
-            print(f"Error in compliance processing: {e}")
+        except Exception:
+            logger.exception("Error in compliance processing")
             return []
     
     def add_document_to_database(self, document_content: str, document_title: str, category: str = "general"):
         """Add a new regulatory document to the vector database"""
+        return self.add_documents_to_database([{
+            "content": document_content,
+            "title": document_title,
+            "category": category
+        }])
+    
+    def add_documents_to_database(self, documents: List[Dict[str, str]], batch_size: int = 100) -> bool:
+        """Add regulatory documents to the vector database with one embedding request and one upsert per batch of chunks"""
         try:
-            # Get embedding for the document
-            embedding = self._get_embedding(document_content)
+            added_date = datetime.now()
             
-            # Prepare metadata
-            metadata = {
-                "title": document_title,
-                "content": document_content,
-                "category": category,
-                "added_date": datetime.now().isoformat()
-            }
+            chunks = []
+            for number, document in enumerate(documents):
+                doc_id = f"doc_{added_date.timestamp()}_{number}"
+                for chunk_index, text in enumerate(self._chunk_document(document["content"])):
+                    # Prepare metadata
+                    metadata = {
+                        "title": document["title"],
+                        "doc_id": doc_id,
+                        "chunk_index": chunk_index,
+                        "category": document.get("category", "general"),
+                        "added_date": added_date.isoformat()
+                    }
+                    chunks.append((f"{doc_id}#{chunk_index}", text, metadata))
             
-            # Upsert to Pinecone
-            self.index.upsert(
-                vectors=[{
-                    "id": f"doc_{datetime.now().timestamp()}",
-                    "values": embedding,
-                    "metadata": metadata
-                }]
-            )
+            for start in range(0, len(chunks), batch_size):
+                batch = chunks[start:start + batch_size]
+                
+                # Get embeddings for the chunks
+                embeddings = self._get_embeddings_batch([text for _, text, _ in batch])
+                
+                # Store the text before the vectors become queryable
+                self.document_store.put([(chunk_id, text) for chunk_id, text, _ in batch])
+                
+                # Upsert to Pinecone
+                self.index.upsert(vectors=[
+                    {"id": chunk_id, "values": embedding, "metadata": metadata}
+                    for (chunk_id, _, metadata), embedding in zip(batch, embeddings)
+                ])
+            
+            # Cached matches and findings predate these documents
+            self._query_cache.clear()
+            self._recent_matches.clear()
+            self._findings_cache.clear()
             
             return True
-        except Exception as e:
-            print(f"Error adding document to database: {e}")
+        except Exception:
+            logger.exception("Error adding documents to database")
             return False
     
+    @staticmethod
+    def _chunk_document(content: str) -> List[str]:
+        """Split document content into chunks of at most _CHUNK_WORDS words"""
+        words = content.split()
+        if not words:
+            return [content]
+        return [" ".join(words[start:start + _CHUNK_WORDS]) for start in range(0, len(words), _CHUNK_WORDS)]
+    
     def get_compliance_statistics(self) -> Dict[str, Any]:
         """Get statistics about the compliance monitoring system"""
         try:
@@ -385,4 +431,13 @@ class ComplianceAgent:
                 "categories": self.compliance_categories.keys()
             }
         except Exception as e:
-            return {"error": str(e)} 
\ No newline at end of file
+            return {"error": str(e)}
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get hit/miss statistics for the embedding, query and findings caches"""
+        return {
+            "embeddings": self._embedding_cache.stats(),
+            "queries": self._query_cache.stats(),
+            "similar_queries": self._recent_matches.stats(),
+            "findings": self._findings_cache.stats()
+        }
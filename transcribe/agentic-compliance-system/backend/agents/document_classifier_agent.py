@@ -1,12 +1,70 @@
 from crewai import Agent, Task, Crew
 from langchain_openai import ChatOpenAI
-from typing import List, Dict, Any, Optional
-import json
-from pydantic import BaseModel
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+import asyncio
+import hashlib
+import orjson
+import logging
+import os
+from pydantic import BaseModel, ConfigDict
+from dataclasses import dataclass
 from datetime import datetime
+from aiolimiter import AsyncLimiter
+from openai import RateLimitError
+
+from .keyword_matcher import KeywordMatcher
+from .query_cache import QueryCache
+
+logger = logging.getLogger(__name__)
+
+# Checked in order; the first matching bucket determines the document type
+_DOCUMENT_TYPE_KEYWORDS = {
+    "regulation": ("regulation", "regulatory", "compliance"),
+    "policy": ("policy", "procedure", "guideline"),
+    "law": ("law", "statute", "act"),
+    "standard": ("standard", "requirement", "specification")
+}
+
+_DOCUMENT_TYPE_MATCHER = KeywordMatcher(_DOCUMENT_TYPE_KEYWORDS)
+
+# Sentences containing one of these are reported as important phrases
+_PHRASE_TRIGGER_MATCHER = KeywordMatcher({
+    "trigger": ("must", "shall", "required", "prohibited", "violation", "penalty")
+})
+
+# Checked in order; the first matching bucket determines the risk level
+_RISK_KEYWORDS = {
+    "high": ("penalty", "violation", "prohibited", "illegal", "criminal", "fine"),
+    "medium": ("required", "must", "shall", "compliance", "regulation")
+}
+
+_RISK_MATCHER = KeywordMatcher(_RISK_KEYWORDS)
+
+def _first_sentences(text: str, count: int) -> Iterator[str]:
+    """Yield text.split('.')[:count] without splitting or copying the rest of the text"""
+    start = 0
+    for _ in range(count):
+        end = text.find('.', start)
+        if end < 0:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+# Static parts of the crew task descriptions
+_ANALYSIS_INSTRUCTIONS = """
+            Analyze the following document for classification.
+            Identify key themes, regulatory areas, and document type."""
+
+_METADATA_INSTRUCTIONS = """
+            Extract relevant metadata, keywords, and important phrases from the document.
+            Identify compliance indicators and assess risk level."""
 
 class DocumentCategory(BaseModel):
     """Model for document classification results"""
+    # Cached results are shared between callers, so instances are immutable
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     document_title: str
     category: str
     subcategory: Optional[str] = None
@@ -15,6 +73,13 @@ class DocumentCategory(BaseModel):
     description: str
     added_date: str
 
+@dataclass
+class ClassificationBatchConfig:
+    """Settings for classifying many documents at once"""
+    batch_size: int = 100
+    max_concurrent_tasks: int = 8
+    retry_attempts: int = 3
+
 class DocumentClassifierAgent:
     """Document classification agent using CrewAI"""
     
@@ -28,9 +93,26 @@ class DocumentClassifierAgent:
             temperature=0.1
         )
         
+        # CrewAI's step-by-step console output is for debugging only
+        self.verbose = os.getenv("CREWAI_VERBOSE", "false").lower() == "true"
+        
         # Create CrewAI agents
         self._create_agents()
         
+        # LLM throttling: bounded in-flight requests plus a per-minute ceiling
+        self.max_concurrent_llm = int(os.getenv("CLASSIFIER_LLM_CONCURRENCY", "8"))
+        self.llm_requests_per_minute = int(os.getenv("CLASSIFIER_LLM_RPM", "60"))
+        self._llm_semaphore = asyncio.Semaphore(self.max_concurrent_llm)
+        self._llm_rate_limiter = AsyncLimiter(self.llm_requests_per_minute, 60)
+        
+        # Re-uploaded documents (e.g. new versions of the same policy file)
+        # reuse the earlier classification instead of running the crew again
+        self._classification_cache = QueryCache(max_size=10000, ttl_seconds=24 * 3600)
+        
+        # Classifications answered by the tools alone vs. by the crew
+        self._llm_skipped = 0
+        self._llm_invoked = 0
+        
         # Define compliance categories and their characteristics
         self.compliance_categories = {
             "esg": {
@@ -64,6 +146,21 @@ class DocumentClassifierAgent:
                 "keywords": ["industry", "sector", "specific", "healthcare", "finance", "technology", "manufacturing", "energy", "pharmaceutical", "banking", "insurance"]
             }
         }
+        
+        # The category catalog is part of the classifier's static instructions
+        category_lines = "\n".join(
+            f"            - {category}: {info['description']} (subcategories: {', '.join(info['subcategories'])})"
+            for category, info in self.compliance_categories.items()
+        )
+        self._classification_instructions = f"""
+            Based on the following analysis, classify the document into one of these compliance categories:
+{category_lines}
+            Consider the primary category, subcategory, and confidence level."""
+        
+        # One automaton over every category's keywords, so a document is scanned once
+        self._category_matcher = KeywordMatcher(
+            {category: info["keywords"] for category, info in self.compliance_categories.items()}
+        )
     
     def _create_agents(self):
         """Create the CrewAI agents for document classification"""
@@ -75,7 +172,7 @@ class DocumentClassifierAgent:
             backstory="""You are an expert in document analysis and content classification. 
             You specialize in understanding regulatory documents, legal texts, and compliance materials. 
             You can quickly identify the main themes and categorize documents based on their content.""",
-            verbose=True,
+            verbose=self.verbose,
             allow_delegation=False,
             llm=self.llm,
             tools=[self._analyze_document_content_tool]
@@ -88,7 +185,7 @@ class DocumentClassifierAgent:
             backstory="""You are an expert in regulatory compliance and document classification. 
             You understand the nuances between different types of compliance requirements and can 
             accurately categorize documents based on their content and purpose.""",
-            verbose=True,
+            verbose=self.verbose,
             allow_delegation=False,
             llm=self.llm,
             tools=[self._classify_document_tool]
@@ -101,7 +198,7 @@ class DocumentClassifierAgent:
             backstory="""You are an expert in information extraction and metadata analysis. 
             You can identify key terms, concepts, and important information from documents 
             that will help with future searches and compliance monitoring.""",
-            verbose=True,
+            verbose=self.verbose,
             allow_delegation=False,
             llm=self.llm,
             tools=[self._extract_metadata_tool]
@@ -110,199 +207,316 @@ class DocumentClassifierAgent:
     def _analyze_document_content_tool(self, document_content: str, document_title: str) -> str:
         """Tool for analyzing document content and identifying key themes"""
         try:
-            # Analyze the document content
-            analysis = {
-                "title": document_title,
-                "content_length": len(document_content),
-                "key_themes": [],
-                "regulatory_areas": [],
-                "document_type": "unknown",
-                "summary": ""
-            }
-            
-            # Simple keyword-based analysis
             content_lower = document_content.lower()
-            
-            # Check for document type indicators
-            if any(word in content_lower for word in ["regulation", "regulatory", "compliance"]):
-                analysis["document_type"] = "regulation"
-            elif any(word in content_lower for word in ["policy", "procedure", "guideline"]):
-                analysis["document_type"] = "policy"
-            elif any(word in content_lower for word in ["law", "statute", "act"]):
-                analysis["document_type"] = "law"
-            elif any(word in content_lower for word in ["standard", "requirement", "specification"]):
-                analysis["document_type"] = "standard"
-            
-            # Identify key themes based on categories
-            for category, info in self.compliance_categories.items():
-                keyword_matches = [keyword for keyword in info["keywords"] if keyword in content_lower]
-                if keyword_matches:
-                    analysis["key_themes"].append(category)
-                    analysis["regulatory_areas"].extend(keyword_matches)
-            
-            # Generate a brief summary
-            analysis["summary"] = f"Document appears to be a {analysis['document_type']} related to {', '.join(analysis['key_themes'][:3]) if analysis['key_themes'] else 'general compliance'}"
-            
-            return json.dumps(analysis)
-            
+            return orjson.dumps(self._analyze_document_content(
+                document_content, document_title, content_lower, self._category_matcher.scan(content_lower)
+            )).decode()
         except Exception as e:
-            return json.dumps({"error": str(e)})
+            return orjson.dumps({"error": str(e)}).decode()
     
     def _classify_document_tool(self, analysis_data: str) -> str:
         """Tool for classifying documents into compliance categories"""
         try:
-            analysis = json.loads(analysis_data)
-            
-            classification = {
-                "primary_category": "general",
-                "subcategory": None,
-                "confidence": 0.0,
-                "alternative_categories": [],
-                "reasoning": ""
-            }
-            
-            # Determine primary category based on key themes
-            themes = analysis.get("key_themes", [])
-            if themes:
-                # Use the most prominent theme as primary category
-                classification["primary_category"] = themes[0]
-                classification["confidence"] = 0.8
-                
-                # Add other themes as alternatives
-                classification["alternative_categories"] = themes[1:3]
-                
-                # Determine subcategory
-                category_info = self.compliance_categories.get(themes[0], {})
-                subcategories = category_info.get("subcategories", [])
-                
-                # Simple subcategory assignment (could be enhanced with more sophisticated logic)
-                if subcategories:
-                    classification["subcategory"] = subcategories[0]
-                
-                classification["reasoning"] = f"Document classified as {themes[0]} based on presence of key themes: {', '.join(themes)}"
-            else:
-                classification["reasoning"] = "No specific compliance themes identified, classified as general"
-            
-            return json.dumps(classification)
-            
+            return orjson.dumps(self._classify_document(orjson.loads(analysis_data))).decode()
         except Exception as e:
-            return json.dumps({"error": str(e)})
+            return orjson.dumps({"error": str(e)}).decode()
     
-    def _extract_metadata_tool(self, document_content: str, classification_data: str) -> str:
+    def _extract_metadata_tool(self, document_content: str, analysis_data: str) -> str:
         """Tool for extracting metadata and keywords from documents"""
         try:
-            classification = json.loads(classification_data)
-            
-            metadata = {
-                "keywords": [],
-                "entities": [],
-                "important_phrases": [],
-                "compliance_indicators": [],
-                "risk_level": "low"
-            }
-            
-            # Extract keywords based on category
-            category = classification.get("primary_category", "general")
-            category_info = self.compliance_categories.get(category, {})
-            
-            # Add category-specific keywords
             content_lower = document_content.lower()
-            for keyword in category_info.get("keywords", []):
-                if keyword in content_lower:
-                    metadata["keywords"].append(keyword)
-            
-            # Identify important phrases (simple approach - could be enhanced with NLP)
-            sentences = document_content.split('.')
-            important_phrases = []
-            for sentence in sentences[:10]:  # Look at first 10 sentences
-                if any(keyword in sentence.lower() for keyword in ["must", "shall", "required", "prohibited", "violation", "penalty"]):
-                    important_phrases.append(sentence.strip())
-            
-            metadata["important_phrases"] = important_phrases[:5]  # Limit to 5 phrases
+            return orjson.dumps(self._extract_metadata(
+                document_content, content_lower, orjson.loads(analysis_data), self._category_matcher.scan(content_lower)
+            )).decode()
+        except Exception as e:
+            return orjson.dumps({"error": str(e)}).decode()
+    
+    def _analyze_document_content(self, document_content: str, document_title: str, content_lower: str,
+                                  category_hits: Dict[str, List[str]]) -> Dict[str, Any]:
+        """Identify document type, key themes and regulatory areas.
+        
+        category_hits is the category matcher's scan of content_lower.
+        """
+        # Analyze the document content
+        analysis = {
+            "title": document_title,
+            "content_length": len(document_content),
+            "key_themes": [],
+            "regulatory_areas": [],
+            "document_type": "unknown",
+            "summary": ""
+        }
+        
+        # Simple keyword-based analysis: check for document type indicators
+        document_types = _DOCUMENT_TYPE_MATCHER.matched_buckets(content_lower)
+        for document_type in _DOCUMENT_TYPE_KEYWORDS:
+            if document_type in document_types:
+                analysis["document_type"] = document_type
+                break
+        
+        # Identify key themes based on categories, in catalog order
+        for category, keyword_matches in category_hits.items():
+            analysis["key_themes"].append(category)
+            analysis["regulatory_areas"].extend(keyword_matches)
+        
+        # Generate a brief summary
+        analysis["summary"] = f"Document appears to be a {analysis['document_type']} related to {', '.join(analysis['key_themes'][:3]) if analysis['key_themes'] else 'general compliance'}"
+        
+        return analysis
+    
+    def _classify_document(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Pick the primary category, subcategory and alternatives from an analysis"""
+        classification = {
+            "primary_category": "general",
+            "subcategory": None,
+            "confidence": 0.0,
+            "alternative_categories": [],
+            "reasoning": ""
+        }
+        
+        # Determine primary category based on key themes
+        themes = analysis.get("key_themes", [])
+        if themes:
+            # Use the most prominent theme as primary category
+            classification["primary_category"] = themes[0]
+            classification["confidence"] = 0.8
             
-            # Determine risk level based on content
-            high_risk_words = ["penalty", "violation", "prohibited", "illegal", "criminal", "fine"]
-            medium_risk_words = ["required", "must", "shall", "compliance", "regulation"]
+            # Add other themes as alternatives
+            classification["alternative_categories"] = themes[1:3]
             
-            if any(word in content_lower for word in high_risk_words):
-                metadata["risk_level"] = "high"
-            elif any(word in content_lower for word in medium_risk_words):
-                metadata["risk_level"] = "medium"
+            # Determine subcategory
+            category_info = self.compliance_categories.get(themes[0], {})
+            subcategories = category_info.get("subcategories", [])
             
-            return json.dumps(metadata)
+            # Simple subcategory assignment (could be enhanced with more sophisticated logic)
+            if subcategories:
+                classification["subcategory"] = subcategories[0]
             
-        except Exception as e:
-            return json.dumps({"error": str(e)})
+            classification["reasoning"] = f"Document classified as {themes[0]} based on presence of key themes: {', '.join(themes)}"
+        else:
+            classification["reasoning"] = "No specific compliance themes identified, classified as general"
+        
+        return classification
+    
+    def _extract_metadata(self, document_content: str, content_lower: str, analysis: Dict[str, Any],
+                          category_hits: Dict[str, List[str]]) -> Dict[str, Any]:
+        """Extract keywords, important phrases and risk level"""
+        metadata = {
+            "keywords": [],
+            "entities": [],
+            "important_phrases": [],
+            "compliance_indicators": [],
+            "risk_level": "low"
+        }
+        
+        # Extract keywords based on category; the most prominent theme is
+        # what the classifier picks as primary category
+        themes = analysis.get("key_themes", [])
+        category = themes[0] if themes else "general"
+        
+        # Add category-specific keywords
+        metadata["keywords"] = list(category_hits.get(category, []))
+        
+        # Identify important phrases (simple approach - could be enhanced with NLP)
+        # Look at the first 10 sentences; lowercasing never adds or removes a
+        # '.', so both splits line up without lowercasing each sentence again
+        important_phrases = []
+        for sentence, sentence_lower in zip(_first_sentences(document_content, 10),
+                                            _first_sentences(content_lower, 10)):
+            if _PHRASE_TRIGGER_MATCHER.matched_keywords(sentence_lower):
+                important_phrases.append(sentence.strip())
+        
+        metadata["important_phrases"] = important_phrases[:5]  # Limit to 5 phrases
+        
+        # Determine risk level based on content
+        risk_levels = _RISK_MATCHER.matched_buckets(content_lower)
+        for risk_level in _RISK_KEYWORDS:
+            if risk_level in risk_levels:
+                metadata["risk_level"] = risk_level
+                break
+        
+        return metadata
     
     async def classify_document(self, document_content: str, document_title: str) -> DocumentCategory:
         """Classify a document using the CrewAI agents"""
+        try:
+            return await self._classify(document_content, document_title)
+        except Exception as e:
+            return self._default_category(document_title, e)
+    
+    async def classify_documents(self, documents: List[Tuple[str, str]],
+                                 config: Optional[ClassificationBatchConfig] = None) -> List[DocumentCategory]:
+        """Classify (title, content) pairs concurrently, returning one result per document"""
+        config = config or ClassificationBatchConfig()
+        semaphore = asyncio.Semaphore(config.max_concurrent_tasks)
+        
+        async def classify_one(title: str, content: str) -> DocumentCategory:
+            async with semaphore:
+                for attempt in range(config.retry_attempts + 1):
+                    try:
+                        return await self._classify(content, title)
+                    except RateLimitError:
+                        if attempt == config.retry_attempts:
+                            raise
+                        await asyncio.sleep(2 ** attempt)
+        
+        results: List[DocumentCategory] = []
+        # Only batch_size coroutines exist at a time, however large the corpus
+        for start in range(0, len(documents), config.batch_size):
+            batch = documents[start:start + config.batch_size]
+            outcomes = await asyncio.gather(
+                *(classify_one(title, content) for title, content in batch),
+                return_exceptions=True
+            )
+            for (title, _), outcome in zip(batch, outcomes):
+                if isinstance(outcome, BaseException):
+                    outcome = self._default_category(title, outcome)
+                results.append(outcome)
+        
+        return results
+    
+    async def _classify(self, document_content: str, document_title: str) -> DocumentCategory:
+        cache_key = hashlib.sha256(f"{document_title}\0{document_content}".encode("utf-8")).hexdigest()
+        cached = self._classification_cache.get(cache_key)
+        if cached is not None:
+            return cached.model_copy(update={"added_date": datetime.now().isoformat()})
+        
+        # The tools are deterministic; when they clearly point at one
+        # category the crew would only repeat their answer
+        result = self._run_pipeline(document_content, document_title)
+        cacheable = True
+        if result["_confident"]:
+            self._llm_skipped += 1
+            logger.debug("Classified %r without the crew (%d skipped, %d invoked)",
+                         document_title, self._llm_skipped, self._llm_invoked)
+        else:
+            self._llm_invoked += 1
+            result = await self._run_crew(document_content, document_title)
+            # An unparsable crew answer falls back to "general"; that is not
+            # cached, so the next upload of the document is classified again
+            cacheable = result["_parsed"]
+        
+        # Parse the result and create DocumentCategory object
+        category = DocumentCategory(
+            document_title=document_title,
+            category=result.get("primary_category", "general"),
+            subcategory=result.get("subcategory"),
+            confidence=result.get("confidence", 0.0),
+            keywords=result.get("keywords", []),
+            description=result.get("reasoning", "Document classified"),
+            added_date=datetime.now().isoformat()
+        )
+        if cacheable:
+            self._classification_cache.set(cache_key, category)
+        
+        return category
+    
+    def _run_pipeline(self, document_content: str, document_title: str) -> Dict[str, Any]:
+        """Run the analysis, classification and metadata tools directly, without an LLM.
+        
+        The result's _confident flag is set when the primary category has at
+        least two keyword hits and at least twice as many as any other category.
+        """
+        content_lower = document_content.lower()
+        category_hits = self._category_matcher.scan(content_lower)
+        
+        analysis = self._analyze_document_content(document_content, document_title, content_lower, category_hits)
+        classification = self._classify_document(analysis)
+        metadata = self._extract_metadata(document_content, content_lower, analysis, category_hits)
+        
+        counts = sorted((len(hits) for hits in category_hits.values()), reverse=True)
+        primary_hits = len(category_hits.get(classification["primary_category"], []))
+        runner_up = counts[1] if len(counts) > 1 else 0
+        confident = primary_hits >= 2 and primary_hits == counts[0] and primary_hits >= 2 * runner_up
+        
+        return {**analysis, **classification, **metadata, "_confident": confident}
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Classification cache statistics and how often the crew was needed"""
+        return {
+            "cache": self._classification_cache.stats(),
+            "llm_skipped": self._llm_skipped,
+            "llm_invoked": self._llm_invoked
+        }
+    
+    @staticmethod
+    def _default_category(document_title: str, error: BaseException) -> DocumentCategory:
+        print(f"Error in document classification: {error}")
+        # Return a default category
+        return DocumentCategory(
+            document_title=document_title,
+            category="general",
+            confidence=0.0,
+            keywords=[],
+            description=f"Classification error: {str(error)}",
+            added_date=datetime.now().isoformat()
+        )
+    
+    async def _run_crew(self, document_content: str, document_title: str) -> Dict[str, Any]:
+        """Run the CrewAI agents: analysis first, then classification and metadata together.
+        
+        The result's _parsed flag is set when every agent returned valid JSON.
+        """
+        
+        # Instructions come first and the per-document data last, so the
+        # prompt prefix is identical across documents for prompt caching
+        excerpt = document_content if len(document_content) <= 1000 else f"{document_content[:1000]}..."
         
-        # Create tasks for the crew
         analysis_task = Task(
-            description=f"""
-            Analyze the following document for classification:
-            Title: {document_title}
-            Content: {document_content[:1000]}...
+            description=f"""{_ANALYSIS_INSTRUCTIONS}
             
-            Identify key themes, regulatory areas, and document type.
+            Title: {document_title}
+            Content: {excerpt}
             """,
             agent=self.document_analyzer,
             expected_output="JSON with document analysis results"
         )
+        analysis = await self._kickoff(self.document_analyzer, analysis_task)
+        analysis_json = orjson.dumps(analysis or {}).decode()
         
+        # Classification and metadata extraction both depend only on the
+        # analysis, so they can run concurrently
         classification_task = Task(
-            description=f"""
-            Based on the analysis, classify the document into appropriate compliance categories.
-            Consider the primary category, subcategory, and confidence level.
+            description=f"""{self._classification_instructions}
+            
+            Analysis: {analysis_json}
             """,
             agent=self.classifier,
             expected_output="JSON with classification results"
         )
         
         metadata_task = Task(
-            description=f"""
-            Extract relevant metadata, keywords, and important phrases from the document.
-            Identify compliance indicators and assess risk level.
+            description=f"""{_METADATA_INSTRUCTIONS}
+            
+            Content: {excerpt}
+            Analysis: {analysis_json}
             """,
             agent=self.metadata_extractor,
             expected_output="JSON with metadata extraction results"
         )
         
-        # Create and run the crew
-        crew = Crew(
-            agents=[self.document_analyzer, self.classifier, self.metadata_extractor],
-            tasks=[analysis_task, classification_task, metadata_task],
-            verbose=True
+        classification, metadata = await asyncio.gather(
+            self._kickoff(self.classifier, classification_task),
+            self._kickoff(self.metadata_extractor, metadata_task)
         )
         
+        parts = (analysis, classification, metadata)
+        return {
+            **(analysis or {}), **(classification or {}), **(metadata or {}),
+            "_parsed": all(part is not None for part in parts)
+        }
+    
+    async def _kickoff(self, agent: Agent, task: Task) -> Optional[Dict[str, Any]]:
+        """Run a single-task crew and parse its JSON output, returning None if it is not valid JSON"""
+        crew = Crew(agents=[agent], tasks=[task], verbose=self.verbose)
+        
+        async with self._llm_semaphore, self._llm_rate_limiter:
+            output = await crew.kickoff_async()
+        
         try:
-            result = await crew.kickoff()
-            
-            # Parse the result and create DocumentCategory object
-            # This is a simplified parsing - you might need to adjust based on actual output format
-            category = DocumentCategory(
-                document_title=document_title,
-                category=result.get("primary_category", "general"),
-                subcategory=result.get("subcategory"),
-                confidence=result.get("confidence", 0.0),
-                keywords=result.get("keywords", []),
-                description=result.get("reasoning", "Document classified"),
-                added_date=datetime.now().isoformat()
-            )
-            
-            return category
-            
-        except Exception as e:
-            print(f"Error in document classification: {e}")
-            # Return a default category
-            return DocumentCategory(
-                document_title=document_title,
-                category="general",
-                confidence=0.0,
-                keywords=[],
-                description=f"Classification error: {str(e)}",
-                added_date=datetime.now().isoformat()
-            )
+            return orjson.loads(output.raw)
+        except (orjson.JSONDecodeError, AttributeError, TypeError):
+            return None
     
     def get_category_info(self, category: str) -> Dict[str, Any]:
         """Get information about a specific compliance category"""
@@ -0,0 +1,45 @@
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+class DocumentStore:
+    """SQLite store for document chunk text, keyed by Pinecone vector id.
+
+    Pinecone only keeps the metadata needed to identify a chunk; the text is
+    fetched from here for the matches that pass the relevance threshold.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        # Ingestion and lookups may come from different threads
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, content TEXT NOT NULL)"
+            )
+        return self._connection
+
+    def put(self, chunks: List[Tuple[str, str]]):
+        """Store (id, content) pairs in a single transaction"""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany("INSERT OR REPLACE INTO documents VALUES (?, ?)", chunks)
+
+    def get_many(self, ids: List[str]) -> Dict[str, str]:
+        """Return the content of every stored id among ids"""
+        if not ids:
+            return {}
+
+        placeholders = ", ".join("?" for _ in ids)
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT id, content FROM documents WHERE id IN ({placeholders})", ids
+            ).fetchall()
+
+        return dict(rows)
@@ -0,0 +1,57 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional; fall back to substring checks
+    ahocorasick = None
+
+class KeywordMatcher:
+    """Single-pass matcher for a catalog of keywords grouped into buckets"""
+
+    def __init__(self, buckets: Dict[str, Iterable[str]]):
+        # Keep catalog order so results match the order keywords were listed in
+        self.buckets = {bucket: tuple(keywords) for bucket, keywords in buckets.items()}
+        self.keywords = frozenset(keyword for keywords in self.buckets.values() for keyword in keywords)
+
+        # A keyword may be listed under several buckets
+        keyword_buckets = defaultdict(set)
+        for bucket, keywords in self.buckets.items():
+            for keyword in keywords:
+                keyword_buckets[keyword].add(bucket)
+        self._keyword_buckets = {keyword: frozenset(buckets) for keyword, buckets in keyword_buckets.items()}
+
+        self._automaton = None
+        if ahocorasick is not None and self.keywords:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+
+    def matched_keywords(self, text: str) -> frozenset:
+        """Return every catalog keyword that occurs in the text as a substring"""
+        if self._automaton is not None:
+            return frozenset(keyword for _, keyword in self._automaton.iter(text))
+        return frozenset(keyword for keyword in self.keywords if keyword in text)
+
+    def matched_buckets(self, text: str) -> frozenset:
+        """Return the buckets with at least one keyword in the text, without listing the hits"""
+        return frozenset().union(*(self._keyword_buckets[keyword] for keyword in self.matched_keywords(text)))
+
+    def scan(self, text: str) -> Dict[str, List[str]]:
+        """Return the matched keywords of each bucket that has at least one hit.
+
+        Matching is case-sensitive, so callers should pass lowercased text.
+        """
+        matched = self.matched_keywords(text)
+        hits = {}
+
+        if not matched:
+            return hits
+
+        for bucket, keywords in self.buckets.items():
+            bucket_hits = [keyword for keyword in keywords if keyword in matched]
+            if bucket_hits:
+                hits[bucket] = bucket_hits
+
+        return hits
@@ -0,0 +1,84 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+class RecentMatchCache:
+    """Pinecone matches of recent query embeddings, reused for near-identical queries.
+
+    Embeddings are kept unit-normalized in a ring buffer so one matrix-vector
+    product gives the cosine similarity of a new query to every recent one.
+    Each entry records the scope (e.g. metadata filter) its matches came from,
+    and only entries of the same scope are reused.
+    """
+
+    def __init__(self, capacity: int = 512, min_similarity: float = 0.95):
+        self.capacity = capacity
+        self.min_similarity = min_similarity
+        # float32 rather than float16: NumPy has no BLAS path for half precision,
+        # which makes the product tens of times slower for a 1.5 MB saving
+        self._vectors: Optional[np.ndarray] = None
+        self._matches: List[Any] = [None] * capacity
+        self._scopes: List[Any] = [None] * capacity
+        self._size = 0
+        self._next = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        # Fallback zero embeddings carry no meaning, so never match or store them
+        if norm == 0:
+            return None
+        return vector / norm
+
+    def lookup(self, embedding: List[float], scope: Any = None) -> Optional[List[Any]]:
+        """Return the matches of the most similar recent query, if similar enough"""
+        query = self._normalize(embedding)
+        if query is None or self._size == 0 or query.shape[0] != self._vectors.shape[1]:
+            self.misses += 1
+            return None
+
+        scores = self._vectors[:self._size] @ query
+        scores[[stored != scope for stored in self._scopes[:self._size]]] = -1.0
+        best = int(np.argmax(scores))
+        if scores[best] < self.min_similarity:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return self._matches[best]
+
+    def add(self, embedding: List[float], matches: List[Any], scope: Any = None):
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+
+        if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+            self._vectors = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+            self._size = 0
+            self._next = 0
+
+        self._vectors[self._next] = vector
+        self._matches[self._next] = matches
+        self._scopes[self._next] = scope
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def clear(self):
+        self._matches = [None] * self.capacity
+        self._scopes = [None] * self.capacity
+        self._size = 0
+        self._next = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": self._size,
+            "capacity": self.capacity,
+            "min_similarity": self.min_similarity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
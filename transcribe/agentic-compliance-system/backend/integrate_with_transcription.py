@@ -7,15 +7,62 @@ transcription system (live.py, app.py, etc.) to enable real-time compliance moni
 
 import asyncio
 import aiohttp
-import json
+import itertools
+import orjson
 from datetime import datetime
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, List, Optional, Callable
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Connection pool shared by every client on the same event loop (ComplianceMonitor,
+# the integration example), so per-speaker monitors reuse warm keep-alive
+# connections and DNS entries
+_shared_connector: Optional[aiohttp.TCPConnector] = None
+_shared_connector_loop: Optional[asyncio.AbstractEventLoop] = None
+_shared_connector_users = 0
+
+# Cheap endpoints (health checks, alert listings) should fail fast. Segment
+# analysis (Pinecone and Gemini behind the rate limiters) and document uploads
+# (the classifier) routinely take longer, so they keep aiohttp's default total
+_REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=10, connect=2)
+_PROCESSING_TIMEOUT = aiohttp.ClientTimeout(total=300, connect=2)
+
+# The alert WebSocket is redialled after it drops, backing off from 1 s to 30 s
+_RECONNECT_DELAY_MIN = 1
+_RECONNECT_DELAY_MAX = 30
+
+# Request bodies are encoded with orjson rather than aiohttp's json.dumps
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+def acquire_shared_connector() -> aiohttp.TCPConnector:
+    """Return the shared connector, creating it for the running loop if needed"""
+    global _shared_connector, _shared_connector_loop, _shared_connector_users
+    loop = asyncio.get_running_loop()
+    if _shared_connector is None or _shared_connector.closed or _shared_connector_loop is not loop:
+        _shared_connector = aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=50,
+            ttl_dns_cache=300,
+            keepalive_timeout=60
+        )
+        _shared_connector_loop = loop
+        _shared_connector_users = 0
+    _shared_connector_users += 1
+    return _shared_connector
+
+async def release_shared_connector(connector: aiohttp.TCPConnector):
+    """Close the shared connector once its last monitor has stopped"""
+    global _shared_connector_users
+    if connector is not _shared_connector:
+        await connector.close()
+        return
+    _shared_connector_users -= 1
+    if _shared_connector_users == 0:
+        await connector.close()
+
 class ComplianceMonitor:
     """
     Simple compliance monitoring integration for existing transcription systems.
@@ -26,20 +73,43 @@ class ComplianceMonitor:
         
         # Process transcript segments as they come in
         await monitor.process_segment("Speaker_1", "We should use creative accounting...")
+    
+    Segments submitted concurrently are sent to the backend together: the
+    first waits up to flush_interval_ms for others, up to batch_size per request.
     """
     
     def __init__(self, backend_url: str = "http://localhost:8000", 
-                 alert_callback: Optional[Callable] = None):
+                 alert_callback: Optional[Callable] = None,
+                 batch_size: int = 16, flush_interval_ms: float = 50):
         self.backend_url = backend_url
         self.session: Optional[aiohttp.ClientSession] = None
         self.alert_callback = alert_callback
         self.websocket: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._connector: Optional[aiohttp.TCPConnector] = None
         self._connected = False
+        
+        # Micro-batching of process_segment requests
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._posts: set = set()
+        
+        # Segment batches sent over the WebSocket, awaiting their results
+        self._request_ids = itertools.count()
+        self._pending: Dict[int, asyncio.Future] = {}
     
     async def start(self):
         """Initialize the compliance monitor"""
         try:
-            self.session = aiohttp.ClientSession()
+            # The connector outlives this session; other monitors may be using it
+            self._connector = acquire_shared_connector()
+            self.session = aiohttp.ClientSession(
+                connector=self._connector,
+                connector_owner=False,
+                timeout=_REQUEST_TIMEOUT
+            )
             
             # Test connection
             async with self.session.get(f"{self.backend_url}/health") as response:
@@ -47,8 +117,13 @@ class ComplianceMonitor:
                     logger.info("✅ Connected to compliance monitoring system")
                     self._connected = True
                     
-                    # Start WebSocket connection for alerts
+                    self._queue = asyncio.Queue()
+                    self._flusher = asyncio.create_task(self._flush_segments())
+                    
+                    # Start WebSocket connection for alerts; the listener
+                    # keeps redialling it if it fails or drops
                     await self._connect_websocket()
+                    self._listener = asyncio.create_task(self._listen_for_alerts())
                 else:
                     logger.error("❌ Failed to connect to compliance system")
                     self._connected = False
@@ -59,44 +134,81 @@ class ComplianceMonitor:
     
     async def stop(self):
         """Stop the compliance monitor"""
+        if self._flusher:
+            self._flusher.cancel()
+            # Segments still waiting for a batch are not sent
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                if not future.done():
+                    future.set_result({"error": "Monitor stopped"})
+        if self._listener:
+            # Cancelled first so closing the socket does not trigger a reconnect
+            self._listener.cancel()
         if self.websocket:
             await self.websocket.close()
+            self._fail_pending()
         if self.session:
             await self.session.close()
+            await release_shared_connector(self._connector)
+            self.session = None
         self._connected = False
         logger.info("🛑 Compliance monitor stopped")
     
-    async def _connect_websocket(self):
+    async def _connect_websocket(self) -> bool:
         """Connect to WebSocket for real-time alerts"""
         try:
             ws_url = self.backend_url.replace("http", "ws") + "/ws"
-            self.websocket = await self.session.ws_connect(ws_url)
+            # Heartbeat pings keep the connection alive between alerts;
+            # compress=15 offers permessage-deflate, which uvicorn accepts
+            self.websocket = await self.session.ws_connect(ws_url, heartbeat=20, compress=15)
             logger.info("✅ Connected to WebSocket for real-time alerts")
-            
-            # Start listening for alerts in background
-            asyncio.create_task(self._listen_for_alerts())
+            return True
             
         except Exception as e:
             logger.error(f"❌ Failed to connect to WebSocket: {e}")
+            return False
     
     async def _listen_for_alerts(self):
-        """Listen for real-time alerts"""
-        if not self.websocket:
-            return
-        
+        """Listen for real-time alerts, reconnecting with backoff when the socket drops"""
+        delay = _RECONNECT_DELAY_MIN
+        while True:
+            if self.websocket is None or self.websocket.closed:
+                # Segments go over HTTP in the meantime
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, _RECONNECT_DELAY_MAX)
+                if not await self._connect_websocket():
+                    continue
+            
+            delay = _RECONNECT_DELAY_MIN
+            await self._receive_messages()
+            # Results for batches still in flight will not arrive on this socket
+            self._fail_pending()
+    
+    async def _receive_messages(self):
+        """Dispatch messages from the WebSocket until it closes"""
         try:
             async for msg in self.websocket:
                 if msg.type == aiohttp.WSMsgType.TEXT:
-                    data = json.loads(msg.data)
+                    data = orjson.loads(msg.data)
                     if data.get("type") == "compliance_alert":
                         alert = data.get("data", {})
                         await self._handle_alert(alert)
+                    elif data.get("type") == "segment_results":
+                        future = self._pending.get(data.get("req_id"))
+                        if future is not None and not future.done():
+                            future.set_result(data)
                 elif msg.type == aiohttp.WSMsgType.ERROR:
                     logger.error(f"WebSocket error: {self.websocket.exception()}")
                     break
         except Exception as e:
             logger.error(f"❌ WebSocket error: {e}")
     
+    def _fail_pending(self):
+        """Fail the segment batches awaiting results on the closed WebSocket"""
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("WebSocket closed"))
+    
     async def _handle_alert(self, alert: Dict[str, Any]):
         """Handle incoming compliance alerts"""
         severity = alert.get("severity", "low")
@@ -139,17 +251,83 @@ class ComplianceMonitor:
             "content": content
         }
         
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((payload, future))
+        return await future
+    
+    async def _flush_segments(self):
+        """Send queued segments to the backend in batches"""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Requests run in the background so the next batch can start filling
+            post = asyncio.create_task(self._post_segments(batch))
+            self._posts.add(post)
+            post.add_done_callback(self._posts.discard)
+    
+    async def _post_segments(self, batch: List[tuple]):
+        payloads = [payload for payload, _ in batch]
         try:
-            async with self.session.post(
-                f"{self.backend_url}/api/process-transcript",
-                json=payload
-            ) as response:
-                result = await response.json()
-                logger.info(f"📝 Processed transcript segment for {speaker_id}")
-                return result
+            # The alert WebSocket carries segments too, saving an HTTP request
+            # per batch; plain HTTP is the fallback while it is down
+            results = None
+            if self.websocket is not None and not self.websocket.closed:
+                try:
+                    results = await self._send_segments_ws(payloads)
+                except (ConnectionError, aiohttp.ClientConnectionError) as e:
+                    # The socket dropped with this batch in flight
+                    logger.warning(f"⚠️ WebSocket lost ({e}), resending over HTTP")
+            if results is None:
+                results = await self._post_segments_http(payloads)
+            logger.info(f"📝 Processed {len(batch)} transcript segment(s)")
         except Exception as e:
             logger.error(f"❌ Error processing transcript: {e}")
-            return {"error": str(e)}
+            results = [{"error": str(e)}] * len(batch)
+        
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+    
+    async def _send_segments_ws(self, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        req_id = next(self._request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = future
+        
+        try:
+            await self.websocket.send_str(orjson.dumps({
+                "type": "segments",
+                "req_id": req_id,
+                "segments": payloads
+            }).decode())
+            reply = await asyncio.wait_for(future, _PROCESSING_TIMEOUT.total)
+        finally:
+            self._pending.pop(req_id, None)
+        
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply["results"]
+    
+    async def _post_segments_http(self, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        async with self.session.post(
+            f"{self.backend_url}/api/process-transcript-batch",
+            data=orjson.dumps(payloads),
+            headers=_JSON_HEADERS,
+            timeout=_PROCESSING_TIMEOUT
+        ) as response:
+            response.raise_for_status()
+            return (await response.json())["results"]
     
     async def upload_document(self, title: str, content: str, 
                             category: str = "general") -> Dict[str, Any]:
@@ -177,7 +355,9 @@ class ComplianceMonitor:
         try:
             async with self.session.post(
                 f"{self.backend_url}/api/upload-document",
-                json=payload
+                data=orjson.dumps(payload),
+                headers=_JSON_HEADERS,
+                timeout=_PROCESSING_TIMEOUT
             ) as response:
                 result = await response.json()
                 logger.info(f"📄 Uploaded document: {title}")
@@ -192,6 +372,15 @@ class ComplianceMonitor:
 
 # Integration functions for your existing transcription system
 
+_SEVERITY_COLORS = {
+    "critical": "🔴",
+    "high": "🟠",
+    "medium": "🟡",
+    "low": "🟢"
+}
+
+_ALERT_SEPARATOR = "-" * 50
+
 async def setup_compliance_monitoring(backend_url: str = "http://localhost:8000",
                                     alert_callback: Optional[Callable] = None) -> ComplianceMonitor:
     """
@@ -219,32 +408,26 @@ def create_alert_callback(display_function: Optional[Callable] = None):
         Callback function for handling alerts
     """
     async def alert_callback(alert: Dict[str, Any]):
-        severity = alert.get("severity", "low")
-        message = alert.get("message", "Unknown alert")
-        speaker_id = alert.get("speaker_id", "Unknown")
-        
         # Default display
         if display_function:
             display_function(alert)
         else:
-            # Simple console display
-            severity_colors = {
-                "critical": "🔴",
-                "high": "🟠", 
-                "medium": "🟡",
-                "low": "🟢"
-            }
-            color = severity_colors.get(severity, "⚪")
-            print(f"\n{color} COMPLIANCE ALERT {color}")
-            print(f"Speaker: {speaker_id}")
-            print(f"Severity: {severity.upper()}")
-            print(f"Message: {message}")
-            print(f"Time: {alert.get('timestamp', 'Unknown')}")
+            # Simple console display, written in one call so alert bursts
+            # don't interleave or cost one write per line
+            severity = alert.get("severity", "low")
+            color = _SEVERITY_COLORS.get(severity, "⚪")
+            lines = [
+                f"\n{color} COMPLIANCE ALERT {color}",
+                f"Speaker: {alert.get('speaker_id', 'Unknown')}",
+                f"Severity: {severity.upper()}",
+                f"Message: {alert.get('message', 'Unknown alert')}",
+                f"Time: {alert.get('timestamp', 'Unknown')}"
+            ]
             if alert.get("action_required"):
-                print("⚠️  ACTION REQUIRED")
-                for action in alert.get("action_items", []):
-                    print(f"   • {action}")
-            print("-" * 50)
+                lines.append("⚠️  ACTION REQUIRED")
+                lines.extend(f"   • {action}" for action in alert.get("action_items", []))
+            lines.append(_ALERT_SEPARATOR)
+            print("\n".join(lines))
     
     return alert_callback
 
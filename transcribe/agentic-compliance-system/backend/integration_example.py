@@ -7,10 +7,16 @@ with the new CrewAI-based compliance monitoring system.
 
 import asyncio
 import aiohttp
-import json
+import orjson
 import time
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+from integrate_with_transcription import acquire_shared_connector, release_shared_connector
+
+def _json_dumps(value: Any) -> str:
+    """orjson encoder for aiohttp's json= request bodies, which expect str"""
+    return orjson.dumps(value).decode()
 
 class ComplianceIntegration:
     """Integration class for connecting transcription with compliance monitoring"""
@@ -19,24 +25,35 @@ class ComplianceIntegration:
         self.backend_url = backend_url
         self.session: Optional[aiohttp.ClientSession] = None
         self.websocket: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._connector: Optional[aiohttp.TCPConnector] = None
         
     async def __aenter__(self):
         """Async context manager entry"""
-        self.session = aiohttp.ClientSession()
+        # Pooled keep-alive connections are shared with other clients and
+        # survive this context
+        self._connector = acquire_shared_connector()
+        self.session = aiohttp.ClientSession(
+            connector=self._connector,
+            connector_owner=False,
+            json_serialize=_json_dumps
+        )
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
-        if self.session:
-            await self.session.close()
         if self.websocket:
             await self.websocket.close()
+        if self.session:
+            await self.session.close()
+            await release_shared_connector(self._connector)
+            self.session = None
     
     async def connect_websocket(self):
         """Connect to WebSocket for real-time alerts"""
         try:
             ws_url = self.backend_url.replace("http", "ws") + "/ws"
-            self.websocket = await self.session.ws_connect(ws_url)
+            # Offer permessage-deflate; alert JSON compresses well
+            self.websocket = await self.session.ws_connect(ws_url, compress=15)
             print("✅ Connected to WebSocket for real-time alerts")
             return True
         except Exception as e:
@@ -66,6 +83,32 @@ class ComplianceIntegration:
             print(f"❌ Error processing transcript: {e}")
             return {"error": str(e)}
     
+    async def process_transcript_batch(self, segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Process several transcript segments in one request.
+        
+        Each segment is a dict with speaker_id, content and an optional timestamp.
+        """
+        payload = [
+            {
+                "speaker_id": segment["speaker_id"],
+                "timestamp": segment.get("timestamp") or datetime.now().isoformat(),
+                "content": segment["content"]
+            }
+            for segment in segments
+        ]
+        
+        try:
+            async with self.session.post(
+                f"{self.backend_url}/api/process-transcript-batch",
+                json=payload
+            ) as response:
+                result = await response.json()
+                print(f"📝 Processed {len(payload)} transcript segments: {result}")
+                return result
+        except Exception as e:
+            print(f"❌ Error processing transcripts: {e}")
+            return {"error": str(e)}
+    
     async def upload_document(self, title: str, content: str, category: str = "general") -> Dict[str, Any]:
         """Upload a regulatory document"""
         payload = {
@@ -114,7 +157,7 @@ class ComplianceIntegration:
         try:
             async for msg in self.websocket:
                 if msg.type == aiohttp.WSMsgType.TEXT:
-                    data = json.loads(msg.data)
+                    data = orjson.loads(msg.data)
                     if data.get("type") == "compliance_alert":
                         alert = data.get("data", {})
                         await self.handle_alert(alert)
@@ -218,19 +261,13 @@ async def integrate_with_transcription():
         
         print("\n🎙️ Processing sample transcript segments...")
         
-        # Process sample transcript segments
+        # Process all sample transcript segments in one batch request
         for transcript in sample_transcripts:
             print(f"\n📝 Processing: {transcript['speaker_id']} - '{transcript['content']}'")
-            
-            result = await integration.process_transcript_segment(
-                speaker_id=transcript["speaker_id"],
-                content=transcript["content"]
-            )
-            
             if transcript["expected_violation"]:
                 print(f"Expected violation type: {transcript['expected_violation']}")
-            
-            await asyncio.sleep(2)  # Delay between segments
+        
+        await integration.process_transcript_batch(sample_transcripts)
         
         # Wait a bit for processing
         print("\n⏳ Waiting for processing to complete...")
@@ -1,11 +1,14 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import asyncio
-import json
+import logging
+import orjson
 import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
 import uvicorn
 
@@ -18,6 +21,13 @@ from agents.alert_manager_agent import AlertManagerAgent, ComplianceAlert, Alert
 from dotenv import load_dotenv
 load_dotenv()
 
+# Handlers run on a listener thread, so logging never blocks the event loop on a
+# slow stdout or pipe
+log_queue = queue.Queue(-1)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "info").upper(), handlers=[QueueHandler(log_queue)])
+log_listener = QueueListener(log_queue, logging.StreamHandler(), respect_handler_level=True)
+logger = logging.getLogger(__name__)
+
 # Pydantic models for API requests/responses
 class TranscriptSegment(BaseModel):
     speaker_id: str
@@ -38,7 +48,8 @@ class AlertFilter(BaseModel):
 app = FastAPI(
     title="Agentic AI Compliance System",
     description="Real-time compliance monitoring using CrewAI agents",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -55,28 +66,71 @@ compliance_agent: Optional[ComplianceAgent] = None
 document_classifier: Optional[DocumentClassifierAgent] = None
 alert_manager: Optional[AlertManagerAgent] = None
 
+# Segment batches a single WebSocket client may have in processing at once;
+# further batches wait in the receive loop until one finishes
+WS_MAX_PENDING_BATCHES = int(os.getenv("WS_MAX_PENDING_BATCHES", "4"))
+
 # WebSocket connection manager
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    """Tracks WebSocket clients, each with its own bounded send queue and
+    writer task so a slow client never delays the others"""
+    
+    def __init__(self, max_pending: int = 256):
+        self.max_pending = max_pending
+        self.clients: Dict[WebSocket, asyncio.Queue] = {}
+        self._writers: Dict[WebSocket, asyncio.Task] = {}
+        self._closing: set = set()
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        send_queue = asyncio.Queue(maxsize=self.max_pending)
+        self.clients[websocket] = send_queue
+        self._writers[websocket] = asyncio.create_task(self._write(websocket, send_queue))
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        self.clients.pop(websocket, None)
+        writer = self._writers.pop(websocket, None)
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+
+    async def _write(self, websocket: WebSocket, send_queue: asyncio.Queue):
+        try:
+            while True:
+                await websocket.send_text(await send_queue.get())
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Remove disconnected clients
+            self.disconnect(websocket)
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+        send_queue = self.clients.get(websocket)
+        if send_queue is None:
+            return
+        try:
+            send_queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self._drop(websocket)
 
     async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                # Remove disconnected clients
-                self.active_connections.remove(connection)
+        for websocket in list(self.clients):
+            await self.send_personal_message(message, websocket)
+
+    def _drop(self, websocket: WebSocket):
+        """Disconnect a client that has fallen max_pending messages behind"""
+        logger.warning("Dropping WebSocket client with %d unsent messages", self.max_pending)
+        self.disconnect(websocket)
+        close = asyncio.create_task(self._close(websocket))
+        self._closing.add(close)
+        close.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            # 1013: try again later
+            await websocket.close(code=1013)
+        except Exception:
+            pass
 
 manager = ConnectionManager()
 
@@ -96,16 +150,19 @@ async def alert_callback(alert: ComplianceAlert):
             "action_items": alert.action_items
         }
     }
-    await manager.broadcast(json.dumps(alert_data))
+    await manager.broadcast(orjson.dumps(alert_data).decode())
 
 # Initialize agents on startup
 @app.on_event("startup")
 async def startup_event():
     global compliance_agent, document_classifier, alert_manager
     
+    log_listener.start()
+    
     # Get API keys from environment
     openai_api_key = os.getenv("OPENAI_API_KEY")
     pinecone_api_key = os.getenv("PINECONE_API_KEY")
+    gemini_api_key = os.getenv("GEMINI_API_KEY")
     pinecone_index_name = os.getenv("PINECONE_INDEX_NAME", "compliance-documents")
     
     if not openai_api_key:
@@ -114,13 +171,17 @@ async def startup_event():
     if not pinecone_api_key:
         raise ValueError("PINECONE_API_KEY environment variable is required")
     
+    if not gemini_api_key:
+        raise ValueError("GEMINI_API_KEY environment variable is required")
+    
     try:
         # Initialize agents
         compliance_agent = ComplianceAgent(
             pinecone_api_key=pinecone_api_key,
             pinecone_index_name=pinecone_index_name,
-            openai_api_key=openai_api_key
+            gemini_api_key=gemini_api_key
         )
+        await compliance_agent.startup()
         
         document_classifier = DocumentClassifierAgent(
             openai_api_key=openai_api_key
@@ -137,6 +198,10 @@ async def startup_event():
         print(f"❌ Error initializing agents: {e}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    log_listener.stop()
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -154,13 +219,47 @@ async def health_check():
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
+    # Segment batches sent over the socket are answered as they finish
+    pending = set()
+    slots = asyncio.Semaphore(WS_MAX_PENDING_BATCHES)
     try:
         while True:
-            # Keep connection alive
-            await websocket.receive_text()
+            message = await websocket.receive_text()
+            try:
+                request = orjson.loads(message)
+            except orjson.JSONDecodeError:
+                # Keep-alive or other plain-text message
+                continue
+            
+            if isinstance(request, dict) and request.get("type") == "segments":
+                await slots.acquire()
+                task = asyncio.create_task(_answer_segments(websocket, request))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                task.add_done_callback(lambda _: slots.release())
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Nobody is left to receive the results of unfinished batches
+        for task in pending:
+            task.cancel()
+        # Also covers sockets the manager closed for falling behind
         manager.disconnect(websocket)
 
+async def _answer_segments(websocket: WebSocket, request: Dict[str, Any]):
+    """Process a segment batch received over the WebSocket and send back the results"""
+    reply = {"type": "segment_results", "req_id": request.get("req_id")}
+    try:
+        if not compliance_agent or not alert_manager:
+            raise RuntimeError("Agents not initialized")
+        segments = [TranscriptSegment(**segment) for segment in request.get("segments", [])]
+        reply["results"] = await _process_segments(segments)
+    except Exception as e:
+        reply["error"] = f"Error processing transcripts: {str(e)}"
+    
+    # Goes through the client's send queue, alongside alert broadcasts
+    await manager.send_personal_message(orjson.dumps(reply).decode(), websocket)
+
 # Process transcript segment endpoint
 @app.post("/api/process-transcript")
 async def process_transcript_segment(segment: TranscriptSegment):
@@ -169,40 +268,65 @@ async def process_transcript_segment(segment: TranscriptSegment):
         raise HTTPException(status_code=500, detail="Agents not initialized")
     
     try:
-        # Process the transcript segment for compliance violations
-        violations = await compliance_agent.process_transcript_segment(
-            transcript=segment.content,
-            speaker_id=segment.speaker_id,
-            timestamp=segment.timestamp
-        )
-        
-        # Process violations through alert manager
-        alerts = []
-        for violation in violations:
-            violation_data = {
-                "speaker_id": violation.speaker_id,
-                "timestamp": violation.timestamp,
-                "transcript_segment": violation.transcript_segment,
-                "violation_type": violation.violation_type,
-                "severity": violation.severity,
-                "matched_document": violation.matched_document,
-                "confidence_score": violation.confidence_score,
-                "context": violation.context
-            }
-            
-            alert = await alert_manager.process_violation(violation_data)
-            if alert:
-                alerts.append(alert)
+        result, = await _process_segments([segment])
+        return {**result, "timestamp": datetime.now().isoformat()}
         
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing transcript: {str(e)}")
+
+# Process several transcript segments in one request
+@app.post("/api/process-transcript-batch")
+async def process_transcript_batch(segments: List[TranscriptSegment]):
+    """Process transcript segments for compliance violations, returning one result per segment"""
+    if not compliance_agent or not alert_manager:
+        raise HTTPException(status_code=500, detail="Agents not initialized")
+    
+    try:
         return {
-            "success": True,
-            "violations_detected": len(violations),
-            "alerts_generated": len(alerts),
+            "results": await _process_segments(segments),
             "timestamp": datetime.now().isoformat()
         }
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing transcript: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing transcripts: {str(e)}")
+
+async def _process_segments(segments: List[TranscriptSegment]) -> List[Dict[str, Any]]:
+    """Run segments through the compliance agent and alert manager"""
+    # Process the transcript segments for compliance violations
+    segment_violations = await compliance_agent.process_transcript_segments([
+        {"transcript": segment.content, "speaker_id": segment.speaker_id, "timestamp": segment.timestamp}
+        for segment in segments
+    ])
+    
+    # Process all violations through the alert manager as one batch
+    violation_batch = [
+        {
+            "speaker_id": violation.speaker_id,
+            "timestamp": violation.timestamp,
+            "transcript_segment": violation.transcript_segment,
+            "violation_type": violation.violation_type,
+            "severity": violation.severity,
+            "matched_document": violation.matched_document,
+            "confidence_score": violation.confidence_score,
+            "context": violation.context
+        }
+        for violations in segment_violations
+        for violation in violations
+    ]
+    
+    alerts = iter(await alert_manager.process_violations_batch(violation_batch))
+    
+    results = []
+    for violations in segment_violations:
+        # violations first, so zip stops before taking the next segment's alert
+        segment_alerts = [alert for _, alert in zip(violations, alerts) if alert]
+        results.append({
+            "success": True,
+            "violations_detected": len(violations),
+            "alerts_generated": len(segment_alerts)
+        })
+    
+    return results
 
 # Upload document endpoint
 @app.post("/api/upload-document")
@@ -263,14 +387,14 @@ async def get_alerts(
             except ValueError:
                 raise HTTPException(status_code=400, detail=f"Invalid severity: {severity}")
         
-        alerts = alert_manager.get_alerts(
+        alerts = await alert_manager.get_alerts(
             severity_filter=severity_enum,
             speaker_filter=speaker_id,
             time_range_minutes=time_range_minutes
         )
         
         return {
-            "alerts": [alert.dict() for alert in alerts],
+            "alerts": [alert.to_pydantic().model_dump() for alert in alerts],
             "total_count": len(alerts),
             "timestamp": datetime.now().isoformat()
         }
@@ -286,7 +410,7 @@ async def acknowledge_alert(alert_id: str, acknowledged_by: str):
         raise HTTPException(status_code=500, detail="Alert manager not initialized")
     
     try:
-        success = alert_manager.acknowledge_alert(alert_id, acknowledged_by)
+        success = await alert_manager.acknowledge_alert(alert_id, acknowledged_by)
         
         if not success:
             raise HTTPException(status_code=404, detail="Alert not found")
@@ -329,6 +453,8 @@ async def get_compliance_statistics():
         stats = compliance_agent.get_compliance_statistics()
         return {
             "statistics": stats,
+            "cache": compliance_agent.get_cache_stats(),
+            "classification": document_classifier.get_statistics() if document_classifier else None,
             "timestamp": datetime.now().isoformat()
         }
         
@@ -361,7 +487,7 @@ async def get_categories():
 # Error handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "error": "Internal server error",
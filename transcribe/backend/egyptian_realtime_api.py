@@ -1,42 +1,237 @@
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, File, HTTPException, UploadFile
 from fastapi.responses import JSONResponse
 from transformers import AutoProcessor, AutoModel
+import numpy as np
+import soundfile as sf
 import torch
-import torchaudio
-import os
+from scipy.signal import resample_poly
+import asyncio
+import functools
+import hashlib
+import io
+import logging
+import math
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # Path to your local model directory
 MODEL_DIR = "facebook/seamless-m4t-v2-large"
 TARGET_LANG = "arz"  # Egyptian Arabic
 
+# Concurrent requests are collected for up to BATCH_TIMEOUT seconds and
+# transcribed together in one generate call
+MAX_BATCH_SIZE = 8
+BATCH_TIMEOUT = 0.05
+
+# Transcripts of recently seen uploads, keyed by the SHA-256 of the file bytes
+TRANSCRIPT_CACHE_SIZE = 1024
+TRANSCRIPT_CACHE_TTL = 3600
+
+# Seconds a finished background job's result is kept for polling
+JOB_TTL = 3600
+
+# Input features are padded to a multiple of this many frames (~4 s of audio),
+# so the compiled speech encoder sees a handful of shapes it can reuse
+FEATURE_PAD_MULTIPLE = 400
+
+logger = logging.getLogger(__name__)
+
+# Half precision on GPU (bf16 where supported, else fp16); fp32 on CPU
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+if device.type == "cuda":
+    dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+    torch.backends.cuda.matmul.allow_tf32 = True
+else:
+    dtype = torch.float32
+
 # Load model and processor once at startup
 processor = AutoProcessor.from_pretrained(MODEL_DIR)
-model = AutoModel.from_pretrained(MODEL_DIR)
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model = model.to(device)
+model = AutoModel.from_pretrained(MODEL_DIR, torch_dtype=dtype)
+model = model.to(device).eval()
+
+# On GPU the speech encoder is compiled with CUDA graphs; the eager module is
+# kept to fall back to if compilation fails
+_eager_speech_encoder = model.speech_encoder
+if device.type == "cuda":
+    model.speech_encoder = torch.compile(model.speech_encoder, mode="reduce-overhead")
+
+# key -> (transcript, expires_at), least recently used first
+_transcripts = OrderedDict()
+
+# job_id -> {"status": queued/processing/completed/failed, "transcript" | "error"}
+_jobs = {}
+_job_tasks = set()
+
+# (waveform, future) pairs waiting for the batcher
+_pending = None
+_batcher = None
+
+# Inference runs off the event loop on one thread, so GPU work stays serialized
+_gpu_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="generate")
 
 app = FastAPI()
 
-@app.post("/transcribe")
-async def transcribe(audio_file: UploadFile = File(...)):
-    # Save uploaded file temporarily
-    temp_path = "temp_audio.wav"
-    with open(temp_path, "wb") as f:
-        f.write(await audio_file.read())
-    # Load and resample audio
-    waveform, sample_rate = torchaudio.load(temp_path)
+def _cached_transcript(key: str):
+    entry = _transcripts.get(key)
+    if entry is None:
+        return None
+    transcript, expires_at = entry
+    if expires_at <= time.monotonic():
+        del _transcripts[key]
+        return None
+    _transcripts.move_to_end(key)
+    return transcript
+
+def _cache_transcript(key: str, transcript: str):
+    _transcripts[key] = (transcript, time.monotonic() + TRANSCRIPT_CACHE_TTL)
+    _transcripts.move_to_end(key)
+    while len(_transcripts) > TRANSCRIPT_CACHE_SIZE:
+        _transcripts.popitem(last=False)
+
+def _load_waveform(data: bytes) -> np.ndarray:
+    """Decode an uploaded file into a mono 16 kHz float32 waveform."""
+    waveform, sample_rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=False)
+    if waveform.ndim > 1:
+        waveform = waveform.mean(axis=1)
     if sample_rate != 16000:
-        resampler = torchaudio.transforms.Resample(orig_freq=sample_rate, new_freq=16000)
-        waveform = resampler(waveform)
-    # Prepare input
-    audio_inputs = processor(audios=waveform.unsqueeze(0), return_tensors="pt", sampling_rate=16000)
-    audio_inputs = {k: v.to(device) if isinstance(v, torch.Tensor) else v for k, v in audio_inputs.items()}
-    # Inference
-    output_tokens = model.generate(
-        **audio_inputs,
-        tgt_lang=TARGET_LANG,
-        generate_speech=False
+        divisor = math.gcd(16000, sample_rate)
+        waveform = resample_poly(waveform, 16000 // divisor, sample_rate // divisor).astype(np.float32, copy=False)
+    return waveform
+
+def _to_device(tensor: torch.Tensor) -> torch.Tensor:
+    """Move an input tensor to the model device, casting features to the model dtype."""
+    if device.type == "cuda":
+        tensor = tensor.pin_memory()
+    if tensor.is_floating_point():
+        return tensor.to(device, dtype=dtype, non_blocking=True)
+    return tensor.to(device, non_blocking=True)
+
+def _generate(audio_inputs, generate_kwargs):
+    with torch.inference_mode(), torch.autocast(device_type=device.type, dtype=dtype, enabled=device.type == "cuda"):
+        return model.generate(
+            **audio_inputs,
+            tgt_lang=TARGET_LANG,
+            generate_speech=False,
+            **generate_kwargs
+        )
+
+def _transcribe_batch(waveforms, **generate_kwargs):
+    """Transcribe a list of mono 16 kHz waveforms in one padded batch."""
+    audio_inputs = processor(
+        audios=list(waveforms),
+        return_tensors="pt",
+        sampling_rate=16000,
+        padding=True,
+        pad_to_multiple_of=FEATURE_PAD_MULTIPLE
     )
-    transcript = processor.decode(output_tokens[0].tolist()[0], skip_special_tokens=True)
-    os.remove(temp_path)
-    return JSONResponse({"transcript": transcript})
\ No newline at end of file
+    audio_inputs = {k: _to_device(v) if isinstance(v, torch.Tensor) else v for k, v in audio_inputs.items()}
+    try:
+        output_tokens = _generate(audio_inputs, generate_kwargs)
+    except Exception:
+        if model.speech_encoder is _eager_speech_encoder:
+            raise
+        logger.exception("Compiled speech encoder failed; falling back to eager mode")
+        model.speech_encoder = _eager_speech_encoder
+        output_tokens = _generate(audio_inputs, generate_kwargs)
+    return [
+        processor.decode(tokens, skip_special_tokens=True)
+        for tokens in output_tokens[0].tolist()
+    ]
+
+async def _run_batcher():
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _pending.get()]
+        deadline = loop.time() + BATCH_TIMEOUT
+        while len(batch) < MAX_BATCH_SIZE:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(_pending.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Similar lengths next to each other keep padding small
+        batch.sort(key=lambda item: item[0].shape[-1])
+        try:
+            transcripts = await loop.run_in_executor(
+                _gpu_executor, _transcribe_batch, [waveform for waveform, _ in batch]
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+        for (_, future), transcript in zip(batch, transcripts):
+            if not future.done():
+                future.set_result(transcript)
+
+@app.on_event("startup")
+async def start_batcher():
+    global _pending, _batcher
+    # One short generate on a second of silence pays the CUDA kernel and
+    # autotuning cost up front instead of on the first request
+    await asyncio.get_running_loop().run_in_executor(
+        _gpu_executor, functools.partial(_transcribe_batch, [np.zeros(16000, dtype=np.float32)], max_new_tokens=4)
+    )
+    _pending = asyncio.Queue()
+    _batcher = asyncio.create_task(_run_batcher())
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    if _batcher:
+        _batcher.cancel()
+    _gpu_executor.shutdown(wait=False)
+
+async def _transcribe_bytes(data: bytes) -> str:
+    """Transcribe an uploaded audio file through the cache and the batcher."""
+    # Identical clips (greetings, recorded disclaimers) skip inference
+    key = hashlib.sha256(data).hexdigest()
+    transcript = _cached_transcript(key)
+    if transcript is not None:
+        return transcript
+    # Decode off the event loop, then queue it for the next batch
+    waveform = await asyncio.to_thread(_load_waveform, data)
+    future = asyncio.get_running_loop().create_future()
+    await _pending.put((waveform, future))
+    transcript = await future
+    _cache_transcript(key, transcript)
+    return transcript
+
+@app.post("/transcribe")
+async def transcribe(audio_file: UploadFile = File(...)):
+    data = await audio_file.read()
+    transcript = await _transcribe_bytes(data)
+    return JSONResponse({"transcript": transcript})
+
+async def _run_job(job_id: str, data: bytes):
+    job = _jobs[job_id]
+    job["status"] = "processing"
+    try:
+        job["transcript"] = await _transcribe_bytes(data)
+        job["status"] = "completed"
+    except Exception as e:
+        job["error"] = str(e)
+        job["status"] = "failed"
+    # Finished jobs stay available for polling for JOB_TTL seconds
+    asyncio.get_running_loop().call_later(JOB_TTL, _jobs.pop, job_id, None)
+
+@app.post("/transcribe/jobs")
+async def submit_transcription_job(audio_file: UploadFile = File(...)):
+    """Queue a transcription and return its job id right away, for long uploads."""
+    data = await audio_file.read()
+    job_id = uuid.uuid4().hex
+    _jobs[job_id] = {"status": "queued"}
+    task = asyncio.create_task(_run_job(job_id, data))
+    _job_tasks.add(task)
+    task.add_done_callback(_job_tasks.discard)
+    return JSONResponse({"job_id": job_id, "status": "queued"})
+
+@app.get("/transcribe/jobs/{job_id}")
+async def get_transcription_job(job_id: str):
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse({"job_id": job_id, **job})
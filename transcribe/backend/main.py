@@ -3,8 +3,11 @@ from fastapi.responses import HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
 import httpx
 import asyncio
-import tempfile
-import os
+import logging
+import uvicorn
+from collections import deque
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -19,30 +22,93 @@ app.add_middleware(
 
 FASTER_WHISPER_URL = "http://localhost:5000/inference"
 
+# Audio messages larger than this close the socket with 1009 (message too big)
+MAX_MESSAGE_BYTES = 4 * 1024 * 1024
+# Clients that send nothing for this many seconds are disconnected
+READ_TIMEOUT = 60
+# Chunks waiting for transcription before a client is closed with 1013 (try again later)
+MAX_PENDING_UPLOADS = 8
+
+# One pooled client for every connection, so uploads reuse keep-alive connections
+client = httpx.AsyncClient(
+    timeout=30,
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+)
+
+@app.on_event("shutdown")
+async def close_client():
+    await client.aclose()
+
+async def _transcribe_uploads(websocket: WebSocket, uploads: asyncio.Queue):
+    """Send queued audio for transcription in order and relay each transcript."""
+    while True:
+        audio_data = await uploads.get()
+        files = {"audio_file": ("audio.wav", audio_data, "audio/wav")}
+        transcript = None
+        try:
+            response = await client.post(FASTER_WHISPER_URL, files=files)
+            if response.status_code == 200:
+                transcript = response.json().get("text", "")
+        except (httpx.HTTPError, ValueError):
+            # Connection errors and non-JSON replies count as a failed chunk
+            pass
+        if transcript is not None:
+            await websocket.send_text(transcript)
+        else:
+            await websocket.send_text("[Error: Transcription failed]")
+
 @app.websocket("/ws/audio")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
-    audio_data = bytearray()
+    # Chunks are kept as received and joined once per transcription, instead
+    # of regrowing one buffer on every message
+    frames = deque()
+    buffered = 0
+    # Uploads run in their own task so audio keeps being received while the
+    # previous chunk is transcribed
+    uploads = asyncio.Queue(maxsize=MAX_PENDING_UPLOADS)
+    uploader = asyncio.create_task(_transcribe_uploads(websocket, uploads))
     try:
         while True:
-            chunk = await websocket.receive_bytes()
-            audio_data.extend(chunk)
+            try:
+                chunk = await asyncio.wait_for(websocket.receive_bytes(), READ_TIMEOUT)
+            except asyncio.TimeoutError:
+                await websocket.close(code=1001)
+                return
+            if len(chunk) > MAX_MESSAGE_BYTES:
+                await websocket.close(code=1009)
+                return
+            if uploader.done():
+                # The uploader only stops on an unexpected error, e.g. a failed send
+                logger.error("Transcription uploader failed", exc_info=uploader.exception())
+                await websocket.close(code=1011)
+                return
+            frames.append(chunk)
+            buffered += len(chunk)
             # For demo: after receiving a chunk, transcribe and send result
             # In production, use streaming or chunked approach
-            if len(audio_data) > 16000 * 5:  # ~5 seconds of 16kHz mono audio
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-                    tmp.write(audio_data)
-                    tmp_path = tmp.name
-                async with httpx.AsyncClient() as client:
-                    with open(tmp_path, "rb") as f:
-                        files = {"audio_file": (os.path.basename(tmp_path), f, "audio/wav")}
-                        response = await client.post(FASTER_WHISPER_URL, files=files)
-                        if response.status_code == 200:
-                            transcript = response.json().get("text", "")
-                            await websocket.send_text(transcript)
-                        else:
-                            await websocket.send_text("[Error: Transcription failed]")
-                os.remove(tmp_path)
-                audio_data = bytearray()
+            if buffered > 16000 * 5:  # ~5 seconds of 16kHz mono audio
+                try:
+                    uploads.put_nowait(b"".join(frames))
+                except asyncio.QueueFull:
+                    # Transcription can't keep up with this client
+                    await websocket.close(code=1013)
+                    return
+                frames.clear()
+                buffered = 0
     except WebSocketDisconnect:
-        pass 
\ No newline at end of file
+        pass
+    finally:
+        uploader.cancel()
+
+if __name__ == "__main__":
+    # The protocol layer rejects oversized frames before they are buffered, and
+    # pings reap connections whose peer has gone away
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        ws_max_size=MAX_MESSAGE_BYTES,
+        ws_ping_interval=20,
+        ws_ping_timeout=20
+    )
@@ -1,17 +1,42 @@
-import whisper
+import asyncio
 
-# Path to your audio file
-audio_path = r"C:\Users\amros\Downloads\test_audio.mp3"
+import ctranslate2
+from faster_whisper import BatchedInferencePipeline, WhisperModel
 
-# Load the turbo model (or use "small", "medium", etc. as needed)
-model = whisper.load_model("turbo")
+# Paths to your audio files
+audio_paths = [
+    r"C:\Users\amros\Downloads\test_audio.mp3",
+]
 
-# Transcribe the audio
-result = model.transcribe(audio_path)
+# Files transcribed at the same time; each gets its own CTranslate2 worker
+NUM_WORKERS = 2
 
-# Print the transcription
-print(result["text"])
+# Load the turbo model with CTranslate2 int8 weights (or use "small", "medium", etc. as needed)
+if ctranslate2.get_cuda_device_count() > 0:
+    model = WhisperModel("large-v3-turbo", device="cuda", compute_type="int8_float16", num_workers=NUM_WORKERS)
+else:
+    model = WhisperModel("large-v3-turbo", device="cpu", compute_type="int8", num_workers=NUM_WORKERS)
 
-# Save the transcription to a file
-with open("transcription.txt", "w", encoding="utf-8") as f:
-    f.write(result["text"])
\ No newline at end of file
+# Speech chunks found by VAD are transcribed together in batches
+pipeline = BatchedInferencePipeline(model=model)
+
+def transcribe(audio_path: str) -> str:
+    segments, _ = pipeline.transcribe(audio_path, beam_size=5, batch_size=16, vad_filter=True)
+    return "".join(segment.text for segment in segments)
+
+async def transcribe_async(audio_path: str) -> str:
+    """Transcribe on a worker thread; CTranslate2 releases the GIL while decoding."""
+    return await asyncio.to_thread(transcribe, audio_path)
+
+async def main():
+    # Transcribe the audio
+    texts = await asyncio.gather(*(transcribe_async(audio_path) for audio_path in audio_paths))
+    # Print the transcription
+    for text in texts:
+        print(text)
+    # Save the transcription to a file
+    with open("transcription.txt", "w", encoding="utf-8") as f:
+        f.write("\n".join(texts))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,8 +3,11 @@ import numpy as np
 import torch
 import queue
 import os
-import torchaudio
+import soundfile as sf
+import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from gradio_client import Client, handle_file
 
@@ -13,17 +16,68 @@ SAMPLE_RATE = 16000
 CHUNK_DURATION = 5  # seconds - as requested
 CHUNK_SAMPLES = SAMPLE_RATE * CHUNK_DURATION
 CHANNELS = 1
+BLOCK_SIZE = SAMPLE_RATE  # frames per audio callback (1 s), a fixed size so blocks can be pooled
+BLOCK_POOL_SIZE = 8  # preallocated blocks between the audio callback and the main loop
+VAD_THRESHOLD = 0.3  # Silero speech probability for a chunk to count as speech
 
 # Gradio API client
 API_URL = "http://127.0.0.1:7860/"
 TARGET_LANGUAGE = "arz"  # Egyptian Arabic
+API_WORKERS = 4  # chunks sent to the API at once, while capture continues
 
 # Initialize Gradio client
 client = Client(API_URL)
 
+# Silero VAD; chunks without detected speech are not transcribed
+vad_model, vad_utils = torch.hub.load("snakers4/silero-vad", "silero_vad")
+get_speech_timestamps = vad_utils[0]
+
+def has_speech(chunk):
+    audio = torch.from_numpy(chunk.flatten().astype(np.float32))
+    return bool(get_speech_timestamps(audio, vad_model, threshold=VAD_THRESHOLD, sampling_rate=SAMPLE_RATE))
+
+# gradio_client only uploads files from disk, so each API worker writes its
+# chunks to one temporary WAV of its own instead of a new file per chunk
+_worker_files = threading.local()
+chunk_paths = []
+
+def worker_chunk_path():
+    path = getattr(_worker_files, "path", None)
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        _worker_files.path = path
+        chunk_paths.append(path)
+    return path
+
+def translate_chunk(chunk, chunk_idx, timestamp):
+    """Send one chunk to the Gradio API and print the result; runs on an API worker"""
+    chunk_path = worker_chunk_path()
+    # Save chunk as 16-bit WAV, half the size of float samples
+    sf.write(chunk_path, chunk, SAMPLE_RATE, format="WAV", subtype="PCM_16")
+    
+    try:
+        result = client.predict(
+            handle_file(chunk_path),
+            TARGET_LANGUAGE,
+            api_name="/handle_translation"
+        )
+        
+        # Only display result if it passes the filter
+        if should_display_result(result):
+            print(f"\n[{chunk_idx}] {timestamp}: {result}\n")
+    except Exception as e:
+        print(f"API request error: {e}")
+
 # Queue for audio chunks
 q = queue.Queue()
 
+# Free blocks for the callback to copy into, so it doesn't allocate on the
+# audio thread; the main loop hands each one back once it is in the ring
+free_blocks = queue.Queue()
+for _ in range(BLOCK_POOL_SIZE):
+    free_blocks.put(np.empty((BLOCK_SIZE, CHANNELS), dtype=np.float32))
+
 # Phrases to filter out
 FILTERED_PHRASES = ["أنا مش عارفة، أنا مش عارفة، أنا مش عارفة"]
 
@@ -31,19 +85,20 @@ def callback(indata, frames, time, status):
     """Callback function for the audio stream"""
     if status:
         print(f"Status: {status}")
-    q.put(indata.copy())
+    try:
+        block = free_blocks.get_nowait()
+    except queue.Empty:
+        # Main loop is behind; allocate rather than drop audio
+        block = np.empty_like(indata)
+    np.copyto(block, indata)
+    q.put(block)
 
 def print_recording_indicator(is_recording=True):
     """Print a clear visual indicator that recording is active"""
     if is_recording:
+        # Printed once: the main loop is paced by q.get(), and sleeping here
+        # would only let captured audio pile up in the queue
         print("\n🔴 RECORDING NOW - Please speak... 🎤")
-        # Print a progress bar for the current chunk
-        for i in range(CHUNK_DURATION):
-            remaining = CHUNK_DURATION - i
-            bar = "█" * i + "░" * remaining
-            print(f"\r[{bar}] {remaining} seconds remaining", end="")
-            time.sleep(1)
-        print("\r" + " " * 50, end="\r")  # Clear the line
     else:
         print("\n⏸️  Processing audio... (not recording)")
 
@@ -73,10 +128,13 @@ def main():
         print(f"Starting in {i}...")
         time.sleep(1)
     
+    executor = ThreadPoolExecutor(max_workers=API_WORKERS)
     try:
         # Start the audio input stream
-        with sd.InputStream(samplerate=SAMPLE_RATE, channels=CHANNELS, callback=callback):
-            buffer = np.empty((0, CHANNELS), dtype=np.float32)
+        with sd.InputStream(samplerate=SAMPLE_RATE, channels=CHANNELS, blocksize=BLOCK_SIZE, dtype="float32", callback=callback):
+            # Preallocated ring of two chunks; samples ring[start:end] are not yet processed
+            ring = np.empty((2 * CHUNK_SAMPLES, CHANNELS), dtype=np.float32)
+            start = end = 0
             chunk_idx = 0
             
             # Initial recording indicator
@@ -86,43 +144,31 @@ def main():
                 # Get audio chunk from queue
                 audio_chunk = q.get()
                 
-                # Add to buffer
-                buffer = np.concatenate((buffer, audio_chunk), axis=0)
+                # Add to buffer, first moving the unprocessed tail to the front
+                # if the block would run past the end
+                n = len(audio_chunk)
+                if end + n > len(ring):
+                    ring[:end - start] = ring[start:end]
+                    start, end = 0, end - start
+                ring[end:end + n] = audio_chunk
+                end += n
+                free_blocks.put(audio_chunk)
                 
                 # Process complete chunks
-                while len(buffer) >= CHUNK_SAMPLES:
-                    # Extract a chunk
-                    chunk = buffer[:CHUNK_SAMPLES]
-                    buffer = buffer[CHUNK_SAMPLES:]
+                while end - start >= CHUNK_SAMPLES:
+                    # Extract a chunk; copied since the ring is overwritten
+                    chunk = ring[start:start + CHUNK_SAMPLES].copy()
+                    start += CHUNK_SAMPLES
                     
-                    # Indicate we're processing (not recording)
-                    print_recording_indicator(False)
+                    # Silent chunks are not sent to the API
+                    if not has_speech(chunk):
+                        chunk_idx += 1
+                        continue
                     
-                    # Save chunk as WAV file
+                    # Send to Gradio API without pausing capture
                     timestamp = datetime.now().strftime("%H%M%S")
-                    chunk_path = f"temp_chunk_{timestamp}.wav"
-                    torchaudio.save(chunk_path, torch.from_numpy(chunk.T), SAMPLE_RATE)
-                    
-                    # Send to Gradio API
-                    try:
-                        print(f"Sending chunk {chunk_idx} to API...")
-                        result = client.predict(
-                            handle_file(chunk_path),
-                            TARGET_LANGUAGE,
-                            api_name="/handle_translation"
-                        )
-                        
-                        # Only display result if it passes the filter
-                        if should_display_result(result):
-                            print(f"\n[{chunk_idx}] {timestamp}: {result}\n")
-                    except Exception as e:
-                        print(f"API request error: {e}")
-                    
-                    # Clean up
-                    try:
-                        os.remove(chunk_path)
-                    except:
-                        pass
+                    print(f"Sending chunk {chunk_idx} to API...")
+                    executor.submit(translate_chunk, chunk, chunk_idx, timestamp)
                     
                     chunk_idx += 1
                     
@@ -133,6 +179,14 @@ def main():
         print("\nStopped by user.")
     except Exception as e:
         print(f"Error: {e}")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        # Clean up
+        for chunk_path in chunk_paths:
+            try:
+                os.remove(chunk_path)
+            except OSError:
+                pass
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
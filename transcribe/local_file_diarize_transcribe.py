@@ -3,11 +3,12 @@ realtime_diarize_transcribe.py
 
 Real-time (chunked) speech-to-text and speaker diarization.
 - Uses pyannote.audio for diarization
-- Uses OpenAI Whisper for multilingual transcription and language detection
+- Uses faster-whisper (CTranslate2) for multilingual transcription and language detection
+- Skips chunks without speech using Silero VAD
 - Outputs speaker-labeled, language-tagged transcript segments in near real-time
 
 Dependencies:
-    pip install torch torchaudio openai-whisper pyannote.audio sounddevice numpy scipy
+    pip install torch torchaudio faster-whisper pyannote.audio sounddevice numpy
 
 Usage:
     python realtime_diarize_transcribe.py
@@ -15,26 +16,43 @@ Usage:
 
 import numpy as np
 import sounddevice as sd
-import whisper
+import torch
+from faster_whisper import WhisperModel
 from pyannote.audio import Pipeline
+from whisper_batching import transcribe_turns
 import queue
 import time
-import os
-import tempfile
-from scipy.io.wavfile import write
+from collections import Counter, deque
 
 # ========== CONFIGURATION ==========
 SAMPLE_RATE = 16000
 CHANNELS = 1
 CHUNK_DURATION = 5  # seconds
+CHUNK_SAMPLES = SAMPLE_RATE * CHUNK_DURATION
 WHISPER_MODEL_SIZE = "base"  # or "small", "medium", "large"
+WHISPER_BATCH_SIZE = 8  # turns transcribed per batched Whisper call
+VAD_THRESHOLD = 0.3  # Silero speech probability for a chunk to count as speech
+LANGUAGE_REDETECT_INTERVAL = 30  # seconds a detected language stays pinned for the session
 
 # ========== MODEL LOADING ==========
 print("Loading models...")
-whisper_model = whisper.load_model(WHISPER_MODEL_SIZE)
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+# CTranslate2 int8 weights (int8 compute with fp16 activations on GPU)
+compute_type = "int8_float16" if device.type == "cuda" else "int8"
+whisper_model = WhisperModel(WHISPER_MODEL_SIZE, device=device.type, compute_type=compute_type)
 pipeline = Pipeline.from_pretrained("pyannote/speaker-diarization")
+pipeline.to(device)
 print("Models loaded.")
 
+# ========== VOICE ACTIVITY DETECTION ==========
+# Silero VAD; chunks without detected speech are not transcribed
+vad_model, vad_utils = torch.hub.load("snakers4/silero-vad", "silero_vad")
+get_speech_timestamps = vad_utils[0]
+
+def has_speech(chunk):
+    audio = torch.from_numpy(chunk.flatten().astype(np.float32))
+    return bool(get_speech_timestamps(audio, vad_model, threshold=VAD_THRESHOLD, sampling_rate=SAMPLE_RATE))
+
 # ========== AUDIO STREAM SETUP ==========
 audio_queue = queue.Queue()
 
@@ -43,28 +61,44 @@ def audio_callback(indata, frames, time_info, status):
 
 stream = sd.InputStream(samplerate=SAMPLE_RATE, channels=CHANNELS, callback=audio_callback)
 
-def process_chunk(chunk, sample_rate):
-    # Save chunk to a temporary WAV file for pyannote
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmpfile:
-        write(tmpfile.name, sample_rate, (chunk * 32767).astype(np.int16))
-        tmp_wav = tmpfile.name
+# Language detected for the session and when; later turns reuse it until
+# LANGUAGE_REDETECT_INTERVAL passes, skipping Whisper's detection step
+session_language = None
+language_detected_at = 0.0
 
-    # Diarization
-    diarization = pipeline(tmp_wav)
+def process_chunk(chunk, sample_rate):
+    global session_language, language_detected_at
+    # Diarization on the in-memory chunk, shaped (channels, samples), so
+    # pyannote never writes or re-decodes a WAV file
+    waveform = torch.from_numpy(chunk.astype(np.float32).T)
+    # fp16 autocast on GPU runs the segmentation and embedding models on tensor cores
+    with torch.autocast(device_type=device.type, dtype=torch.float16, enabled=device.type == "cuda"):
+        diarization = pipeline({"waveform": waveform, "sample_rate": sample_rate})
 
     # Load audio for Whisper
     audio = chunk.flatten().astype(np.float32)
-    results = []
+    turns = []
+    clips = []
     for turn, _, speaker in diarization.itertracks(yield_label=True):
         start = int(turn.start * sample_rate)
         end = int(turn.end * sample_rate)
         segment = audio[start:end]
         if len(segment) < sample_rate // 2:
             continue
+        turns.append((turn, speaker))
         # Whisper expects 16kHz float32 numpy array
-        result = whisper_model.transcribe(segment, language=None, task="transcribe")
-        text = result["text"].strip()
-        language = result["language"]
+        clips.append(segment)
+
+    now = time.monotonic()
+    pinned = session_language if now - language_detected_at < LANGUAGE_REDETECT_INTERVAL else None
+    transcribed = transcribe_turns(whisper_model, clips, WHISPER_BATCH_SIZE, pinned)
+    if pinned is None and transcribed:
+        # Pin the language most turns in this chunk were detected as
+        session_language = Counter(language for _, language in transcribed).most_common(1)[0][0]
+        language_detected_at = now
+
+    results = []
+    for (turn, speaker), (text, language) in zip(turns, transcribed):
         results.append({
             "speaker": speaker,
             "start": turn.start,
@@ -73,25 +107,39 @@ def process_chunk(chunk, sample_rate):
             "text": text
         })
         print(f"[Speaker {speaker}] ({language}) {turn.start:.2f}-{turn.end:.2f}s: {text}")
-    os.remove(tmp_wav)
     return results
 
 def main():
     print("Starting real-time transcription and diarization. Press Ctrl+C to stop.")
     stream.start()
     try:
-        buffer = []
+        # Captured blocks waiting to be processed, with their total sample count
+        buffer = deque()
+        buffered = 0
         start_time = time.time()
         while True:
             if not audio_queue.empty():
                 chunk = audio_queue.get()
                 buffer.append(chunk)
+                buffered += chunk.shape[0]
                 # If enough audio for a chunk, process it
-                if len(buffer) * chunk.shape[0] >= SAMPLE_RATE * CHUNK_DURATION:
-                    audio_chunk = np.concatenate(buffer)[:SAMPLE_RATE * CHUNK_DURATION]
-                    process_chunk(audio_chunk, SAMPLE_RATE)
-                    # Remove processed samples from buffer
-                    buffer = [np.concatenate(buffer)[SAMPLE_RATE * CHUNK_DURATION:]]
+                if buffered >= CHUNK_SAMPLES:
+                    # Take exactly one chunk's worth of blocks from the front; the
+                    # remainder of the last block goes back for the next chunk
+                    parts = []
+                    needed = CHUNK_SAMPLES
+                    while needed > 0:
+                        block = buffer.popleft()
+                        if block.shape[0] > needed:
+                            buffer.appendleft(block[needed:])
+                            block = block[:needed]
+                        parts.append(block)
+                        needed -= block.shape[0]
+                    buffered -= CHUNK_SAMPLES
+                    audio_chunk = np.concatenate(parts)
+                    # Silent chunks skip diarization and Whisper
+                    if has_speech(audio_chunk):
+                        process_chunk(audio_chunk, SAMPLE_RATE)
             else:
                 time.sleep(0.1)
     except KeyboardInterrupt:
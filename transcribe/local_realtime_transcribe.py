@@ -1,19 +1,27 @@
 import numpy as np
-import whisper
+import soundfile as sf
+import torch
+from faster_whisper import WhisperModel
 from pyannote.audio import Pipeline
+from whisper_batching import transcribe_turns
 from resemblyzer import VoiceEncoder, preprocess_wav
-from scipy.io import wavfile
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 # ========== CONFIGURATION ==========
 AUDIO_FILE = "your_audio.wav"  # Path to your audio file
 WHISPER_MODEL_SIZE = "base"
+WHISPER_BATCH_SIZE = 8  # turns transcribed per batched Whisper call
 ENROLL_DIR = "enrolled_speakers"
 
 # ========== MODEL LOADING ==========
 print("Loading models...")
-whisper_model = whisper.load_model(WHISPER_MODEL_SIZE)
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+# CTranslate2 int8 weights (int8 compute with fp16 activations on GPU)
+compute_type = "int8_float16" if device.type == "cuda" else "int8"
+whisper_model = WhisperModel(WHISPER_MODEL_SIZE, device=device.type, compute_type=compute_type)
 pipeline = Pipeline.from_pretrained("pyannote/speaker-diarization")
+pipeline.to(device)
 encoder = VoiceEncoder()
 print("Models loaded.")
 
@@ -26,23 +34,26 @@ def enroll_speaker(name, wav_path):
     print(f"Speaker '{name}' enrolled.")
 
 def load_enrolled_speakers():
-    speakers = {}
-    if not os.path.exists(ENROLL_DIR):
-        return speakers
-    for fname in os.listdir(ENROLL_DIR):
-        if fname.endswith(".npy"):
-            name = fname[:-4]
-            embedding = np.load(os.path.join(ENROLL_DIR, fname))
-            speakers[name] = embedding
-    return speakers
+    """Return enrolled names and their embeddings as a unit-normalized (K, D) matrix."""
+    names = []
+    embeddings = []
+    if os.path.exists(ENROLL_DIR):
+        for fname in os.listdir(ENROLL_DIR):
+            if fname.endswith(".npy"):
+                names.append(fname[:-4])
+                embeddings.append(np.load(os.path.join(ENROLL_DIR, fname)))
+    if not names:
+        return names, None
+    matrix = np.stack(embeddings).astype(np.float32)
+    return names, matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
 
 def identify_speaker(embedding, enrolled_speakers, threshold=0.7):
-    from scipy.spatial.distance import cdist
-    if not enrolled_speakers:
+    names, matrix = enrolled_speakers
+    if not names:
         return "Unknown"
-    names = list(enrolled_speakers.keys())
-    embeddings = np.stack([enrolled_speakers[n] for n in names])
-    dists = cdist([embedding], embeddings, metric="cosine")[0]
+    # Cosine distance to every enrolled speaker in one matrix-vector product
+    query = embedding.astype(np.float32) / np.linalg.norm(embedding)
+    dists = 1.0 - matrix @ query
     min_idx = np.argmin(dists)
     if dists[min_idx] < threshold:
         return names[min_idx]
@@ -51,25 +62,31 @@ def identify_speaker(embedding, enrolled_speakers, threshold=0.7):
 # ========== MAIN PIPELINE ==========
 def process_audio_file(audio_file):
     enrolled_speakers = load_enrolled_speakers()
+    # Read audio once, decoded straight to float32 (frames, channels); pyannote
+    # gets the decoded waveform instead of the path
+    samples, sr = sf.read(audio_file, dtype="float32", always_2d=True)
     # Diarization
-    diarization = pipeline({"audio": audio_file})
-    # Read audio
-    sr, audio = wavfile.read(audio_file)
-    if audio.ndim > 1:
-        audio = audio[:, 0]  # Use first channel if stereo
-    audio = audio.astype(np.float32) / np.max(np.abs(audio))
+    # Diarization models run under fp16 autocast on GPU
+    with torch.autocast(device_type=device.type, dtype=torch.float16, enabled=device.type == "cuda"):
+        diarization = pipeline({"waveform": torch.from_numpy(samples.T), "sample_rate": sr})
+    audio = np.ascontiguousarray(samples[:, 0])  # Use first channel if stereo
+    audio /= np.max(np.abs(audio))
+    clips = []
     for turn, _, speaker in diarization.itertracks(yield_label=True):
         start = int(turn.start * sr)
         end = int(turn.end * sr)
         segment = audio[start:end]
         if len(segment) < sr:
             continue
-        embedding = encoder.embed_utterance(segment)
-        speaker_name = identify_speaker(embedding, enrolled_speakers)
         # Whisper expects 16kHz mono float32 numpy array
-        result = whisper_model.transcribe(segment, language=None, task="transcribe")
-        text = result["text"].strip()
-        language = result["language"]
+        clips.append(segment)
+    # CTranslate2 releases the GIL, so Whisper transcribes the turns on a
+    # worker thread while the speaker embeddings are computed here
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        transcription = executor.submit(transcribe_turns, whisper_model, clips, WHISPER_BATCH_SIZE)
+        speaker_names = [identify_speaker(encoder.embed_utterance(clip), enrolled_speakers) for clip in clips]
+        transcripts = transcription.result()
+    for speaker_name, (text, language) in zip(speaker_names, transcripts):
         print(f"[{speaker_name}] ({language}): {text}")
 
 if __name__ == "__main__":
@@ -32,10 +32,20 @@ json_tool = JSONSearchTool(
             },
         },
         "embedding_model": {
-            "provider": "google",  # Google embeddings
+            # Local SentenceTransformers model, so lookups don't wait on a
+            # remote embedding call
+            "provider": "huggingface",
             "config": {
-                "model": "models/embedding-001",  # Google's embedding model
-                "task_type": "retrieval_document",
+                "model": "sentence-transformers/all-MiniLM-L6-v2",
+            },
+        },
+        # Embeddings are persisted on disk, so later runs load them from
+        # Chroma instead of embedding the JSON corpus again
+        "vectordb": {
+            "provider": "chroma",
+            "config": {
+                "collection_name": "reg_checker_minilm",
+                "dir": "db",
             },
         },
     }
@@ -0,0 +1,53 @@
+"""
+whisper_batching.py
+
+Batched faster-whisper transcription of diarization turns, shared by the
+realtime and file diarize-and-transcribe scripts.
+"""
+
+import numpy as np
+from faster_whisper.audio import pad_or_trim
+from faster_whisper.tokenizer import Tokenizer
+
+def _transcribe_batch(whisper_model, clips, language=None):
+    """Encode up to 30 s clips together, then decode them greedily in one generate call."""
+    features = np.stack([pad_or_trim(whisper_model.feature_extractor(clip)) for clip in clips])
+    encoder_output = whisper_model.encode(features)
+    # Without a pinned language it is detected per clip, as separate transcribe calls would
+    if language is not None:
+        languages = [language] * len(clips)
+    elif whisper_model.model.is_multilingual:
+        languages = [probs[0][0][2:-2] for probs in whisper_model.model.detect_language(encoder_output)]
+    else:
+        languages = ["en"] * len(clips)
+    tokenizers = [
+        Tokenizer(whisper_model.hf_tokenizer, whisper_model.model.is_multilingual, task="transcribe", language=language)
+        for language in languages
+    ]
+    prompts = [tokenizer.sot_sequence + [tokenizer.no_timestamps] for tokenizer in tokenizers]
+    outputs = whisper_model.model.generate(encoder_output, prompts, beam_size=1)
+    return [
+        (tokenizer.decode(output.sequences_ids[0]).strip(), language)
+        for tokenizer, language, output in zip(tokenizers, languages, outputs)
+    ]
+
+def transcribe_turns(whisper_model, clips, batch_size, language=None):
+    """Transcribe diarization turns with whisper_model, batch_size turns per call.
+
+    Returns a (text, language) pair per clip; language=None detects it per
+    clip. Clips longer than Whisper's 30 s window go through
+    whisper_model.transcribe, which windows them.
+    """
+    results = [None] * len(clips)
+    batch = []
+    for i, clip in enumerate(clips):
+        if len(clip) > whisper_model.feature_extractor.n_samples:
+            segments, info = whisper_model.transcribe(clip, language=language, task="transcribe", beam_size=1, vad_filter=False)
+            results[i] = ("".join(s.text for s in segments).strip(), info.language)
+        else:
+            batch.append(i)
+    for offset in range(0, len(batch), batch_size):
+        indices = batch[offset:offset + batch_size]
+        for i, result in zip(indices, _transcribe_batch(whisper_model, [clips[i] for i in indices], language)):
+            results[i] = result
+    return results